@@ -0,0 +1,22 @@
+import argparse
+
+from utils.batch_runner import run_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Separate many images with the settings from config.py"
+    )
+    parser.add_argument('inputs', nargs='+', help="image directories, glob patterns or .txt manifests")
+    parser.add_argument('--out-root', default='batch_output', help="one sub-directory per image is created here")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="re-process images that already have output")
+    args = parser.parse_args()
+
+    summary = run_batch(args.inputs, args.out_root, workers=args.workers, force=args.force)
+    if summary['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Compare sklearn's full-image predict with the unique-color assignment stage.
+
+Run from the repository root:
+    python -m benchmarks.bench_assign --image image-target.png --k 15
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.assign import assign_labels, LabelCache
+from utils.image_loader import load_image
+from utils.kmeans_cpu import kmeans_fit, kmeans_predict
+from utils.lab_lut import rgb_to_lab
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='image-target.png')
+    parser.add_argument('--k', type=int, default=15)
+    args = parser.parse_args()
+
+    flat_data = load_image(args.image)['array'].reshape((-1, 3))
+    rng = np.random.default_rng(42)
+    sample = flat_data[rng.choice(len(flat_data), len(flat_data) // 5, replace=False)]
+    kmeans = kmeans_fit(sample, args.k, use_lab_space=True)
+    rgb_to_lab(flat_data[:1 << 16])  # make sure the Lab table is built and mapped
+
+    def sklearn_predict(data):
+        return kmeans.predict(rgb_to_lab(data).astype(kmeans.cluster_centers_.dtype))
+
+    def predict(colors):
+        return kmeans_predict(kmeans, colors, use_lab_space=True)
+
+    cache = LabelCache(predict, args.k)
+    t_sklearn, expected = timed(sklearn_predict, flat_data)
+    t_chunked, direct = timed(predict, flat_data)
+    t_unique, unique = timed(assign_labels, flat_data, predict)
+    t_cold, _ = timed(cache, flat_data)
+    t_warm, warm = timed(cache, flat_data)
+
+    print(f"{len(flat_data) / 1e6:.1f} MP, k={args.k}, Lab")
+    for name, seconds, labels in [
+        ('sklearn predict', t_sklearn, expected),
+        ('float32 chunked', t_chunked, direct),
+        ('unique colors', t_unique, unique),
+        ('label cache cold', t_cold, None),
+        ('label cache warm', t_warm, warm),
+    ]:
+        agree = '' if labels is None else f"  agreement {np.mean(labels == expected):.5f}"
+        print(f"{name:>18} {seconds:>7.3f} s  {t_sklearn / seconds:>6.1f}x{agree}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Compare output size and export time of the layer formats.
+
+Formats: one RGBA PNG per layer (current), the same cropped to each
+layer's bounding box, a single indexed PNG, and a multi-page 1-bit TIFF.
+
+Run from the repository root:
+    python -m benchmarks.bench_export_formats --size 10 --k 15
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.synthetic import GENERATORS
+from utils.layer_exporter import export_layers
+from utils.layer_formats import export_indexed_png, export_layers_tiff
+from utils.kmeans_cpu import kmeans_cpu
+
+METADATA = {'dpi': (300, 300), 'format': 'PNG'}
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=float, default=10, help='megapixels')
+    parser.add_argument('--k', type=int, default=15)
+    parser.add_argument('--dot-size', type=int, default=1)
+    parser.add_argument('--image', choices=sorted(GENERATORS), default='flat')
+    args = parser.parse_args()
+
+    image = GENERATORS[args.image](args.size, seed=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        labels, centers = kmeans_cpu(image, args.k, ensure_green=False, precision_mode=False,
+                                     use_lab_space=False, use_histogram=True)
+
+    formats = [
+        ('png rgba', lambda out: export_layers(labels, centers, out, METADATA, args.dot_size)),
+        ('png cropped', lambda out: export_layers(labels, centers, out, METADATA, args.dot_size, crop=True)),
+        ('indexed png', lambda out: export_indexed_png(labels, centers, out, METADATA)),
+        ('tiff 1-bit', lambda out: export_layers_tiff(labels, centers, out, METADATA, args.dot_size)),
+    ]
+
+    out_root = tempfile.mkdtemp(prefix='bench_formats_')
+    results = []
+    try:
+        for name, export in formats:
+            out_dir = os.path.join(out_root, name.replace(' ', '_'))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                export(out_dir)
+            results.append((name, time.perf_counter() - start, dir_size(out_dir), len(os.listdir(out_dir))))
+    finally:
+        shutil.rmtree(out_root)
+
+    h, w = labels.shape
+    print(f"{args.image} {h * w / 1e6:.1f} MP, k={args.k}, dot_size={args.dot_size}")
+    print(f"{'format':>12} {'time s':>8} {'size MB':>9} {'files':>6} {'vs rgba':>8}")
+    base_time, base_size = results[0][1], results[0][2]
+    for name, seconds, size, files in results:
+        print(f"{name:>12} {seconds:8.3f} {size / 2**20:9.2f} {files:6d} "
+              f"{base_size / size:6.1f}x / {base_time / seconds:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
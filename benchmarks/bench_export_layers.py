@@ -0,0 +1,94 @@
+"""Compare the vectorized export_layers against the legacy per-pixel loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_export_layers --size 1024 --k 8 --dot-size 1 2 3
+"""
+import argparse
+import contextlib
+import filecmp
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from utils.layer_exporter import rgb_to_hex, export_layers
+
+
+def legacy_export_layers(labels, centers, out_dir, original_metadata, dot_size=1):
+    """Per-pixel implementation kept only as the reference for this benchmark"""
+    os.makedirs(out_dir, exist_ok=True)
+    h, w = labels.shape
+
+    for i, color in enumerate(centers):
+        mask = (labels == i).astype(np.uint8) * 255
+        hex_color = rgb_to_hex(color)
+
+        if mask.sum() == 0:
+            continue
+
+        img = Image.new('RGBA', (w, h), (0, 0, 0, 0))
+        pixels = img.load()
+
+        if 'dpi' in original_metadata:
+            img.info['dpi'] = original_metadata['dpi']
+
+        y_indices, x_indices = np.where(mask > 0)
+        for y, x in zip(y_indices, x_indices):
+            for dy in range(dot_size):
+                for dx in range(dot_size):
+                    if x+dx < w and y+dy < h:
+                        pixels[x+dx, y+dy] = (*color, 255)
+
+        img.save(f"{out_dir}/layer_{i+1}_{hex_color}.png", format='PNG', compress_level=6,
+                 dpi=original_metadata.get('dpi', (72, 72)))
+
+
+def synthetic_labels(size, k, seed=0):
+    """Blocky label map with some speckle, close to what clustering produces"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, k, (size // 16 + 1, size // 16 + 1))
+    labels = np.kron(coarse, np.ones((16, 16), dtype=coarse.dtype))[:size, :size]
+    noise = rng.random((size, size)) < 0.02
+    labels[noise] = rng.integers(0, k, noise.sum())
+    return labels
+
+
+def time_call(fn, *args, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=512, help='square image side in pixels')
+    parser.add_argument('--k', type=int, default=8)
+    parser.add_argument('--dot-size', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--workers', type=int, default=1, help='EXPORT_WORKERS for the vectorized path')
+    args = parser.parse_args()
+
+    labels = synthetic_labels(args.size, args.k)
+    rng = np.random.default_rng(1)
+    centers = rng.integers(0, 256, (args.k, 3)).astype(np.uint8)
+    metadata = {'dpi': (300, 300), 'format': 'PNG'}
+
+    print(f"{args.size}x{args.size} px, k={args.k}, workers={args.workers}")
+    print(f"{'dot_size':>8} {'legacy s':>10} {'vector s':>10} {'speedup':>8} identical")
+    for dot_size in args.dot_size:
+        with tempfile.TemporaryDirectory() as tmp:
+            old_dir = os.path.join(tmp, 'legacy')
+            new_dir = os.path.join(tmp, 'vector')
+            t_old = time_call(legacy_export_layers, labels, centers, old_dir, metadata, dot_size)
+            t_new = time_call(export_layers, labels, centers, new_dir, metadata, dot_size, args.workers)
+            names = sorted(os.listdir(old_dir))
+            _, mismatch, errors = filecmp.cmpfiles(old_dir, new_dir, names, shallow=False)
+            identical = names == sorted(os.listdir(new_dir)) and not mismatch and not errors
+        print(f"{dot_size:>8} {t_old:>10.3f} {t_new:>10.3f} {t_old / t_new:>7.1f}x {identical}")
+
+
+if __name__ == '__main__':
+    main()
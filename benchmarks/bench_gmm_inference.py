@@ -0,0 +1,55 @@
+"""Compare dense GMM inference (predict + predict_proba) with the chunked soft-mask pass.
+
+Run from the repository root:
+    python -m benchmarks.bench_gmm_inference --image image-target.png --k 15
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from utils.image_loader import load_image
+from utils.gmm_cpu import gmm_fit, gmm_predict_chunked
+
+
+def dense_inference(gmm, scaler, flat_data):
+    scaled = scaler.transform(flat_data)
+    return gmm.predict(scaled), gmm.predict_proba(scaled)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='image-target.png')
+    parser.add_argument('--k', type=int, default=15)
+    parser.add_argument('--covariance-type', default='full')
+    parser.add_argument('--chunk-size', type=int, default=262_144)
+    args = parser.parse_args()
+
+    flat_data = load_image(args.image)['array'].reshape((-1, 3))
+    rng = np.random.default_rng(42)
+    sample = flat_data[rng.choice(len(flat_data), min(len(flat_data), 100_000), replace=False)]
+    gmm, scaler = gmm_fit(sample, args.k, args.covariance_type)
+
+    t_dense, m_dense = measure(dense_inference, gmm, scaler, flat_data)
+    t_chunk, m_chunk = measure(gmm_predict_chunked, gmm, scaler, flat_data, args.chunk_size)
+
+    print(f"{len(flat_data) / 1e6:.1f} MP, k={args.k}, covariance={args.covariance_type}")
+    print(f"{'path':>8} {'time s':>8} {'peak MB':>9}")
+    print(f"{'dense':>8} {t_dense:>8.2f} {m_dense / 2**20:>9.1f}")
+    print(f"{'chunked':>8} {t_chunk:>8.2f} {m_chunk / 2**20:>9.1f}")
+    print(f"speedup {t_dense / t_chunk:.1f}x, memory {m_dense / m_chunk:.1f}x smaller")
+
+
+if __name__ == '__main__':
+    main()
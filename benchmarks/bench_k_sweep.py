@@ -0,0 +1,66 @@
+"""Compare one kmeans_sweep call with a separate kmeans_cpu run per K.
+
+Both sides are scored on the whole image with the same measure: squared
+distance of every pixel to its exported uint8 center, in the fit space.
+
+Run from the repository root:
+    python -m benchmarks.bench_k_sweep --image image-target.png --ks 8 10 12 15
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from utils.image_loader import load_image
+from utils.kmeans_cpu import kmeans_cpu, kmeans_sweep, inertia_knee
+from utils.lab_lut import rgb_to_lab
+
+
+def image_inertia(flat_data, labels, centers, use_lab_space):
+    points = rgb_to_lab(flat_data) if use_lab_space else flat_data.astype(np.float32)
+    center_points = rgb_to_lab(centers) if use_lab_space else centers.astype(np.float32)
+    return float(((points - center_points[labels.ravel()]) ** 2).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='image-target.png')
+    parser.add_argument('--ks', type=int, nargs='+', default=[8, 10, 12, 15])
+    parser.add_argument('--no-green', action='store_true', help='k-means++ instead of green seeding')
+    parser.add_argument('--rgb', action='store_true', help='fit in RGB instead of Lab')
+    args = parser.parse_args()
+
+    data = load_image(args.image)['array']
+    flat_data = data.reshape((-1, 3))
+    ensure_green, use_lab_space = not args.no_green, not args.rgb
+    rgb_to_lab(flat_data[:1 << 16])  # make sure the Lab table is built and mapped
+
+    separate = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for k in args.ks:
+            separate[k] = kmeans_cpu(data, k, ensure_green=ensure_green, precision_mode=True,
+                                     use_lab_space=use_lab_space)
+    t_separate = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sweep = kmeans_sweep(data, args.ks, ensure_green=ensure_green, use_lab_space=use_lab_space)
+    t_sweep = time.perf_counter() - start
+
+    print(f"{len(flat_data) / 1e6:.1f} MP, ks={args.ks}, green={ensure_green}, lab={use_lab_space}")
+    print(f"separate kmeans_cpu runs {t_separate:7.2f} s")
+    print(f"kmeans_sweep             {t_sweep:7.2f} s  {t_separate / t_sweep:.1f}x")
+    print(f"{'K':>4} {'separate inertia':>17} {'sweep inertia':>14} {'ratio':>6}")
+    for result in sweep:
+        labels, centers = separate[result['k']]
+        base = image_inertia(flat_data, labels, centers, use_lab_space)
+        ours = image_inertia(flat_data, result['labels'], result['centers'], use_lab_space)
+        print(f"{result['k']:>4} {base:17.4g} {ours:14.4g} {ours / base:6.2f}")
+    print(f"inertia knee at K={inertia_knee([r['k'] for r in sweep], [r['inertia'] for r in sweep])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Compare label-map size and export allocation peaks for int64 labels with
+per-layer temporaries against compact labels with reused layer buffers.
+
+Python-level allocation churn is approximated by the tracemalloc peak
+(NumPy reports its buffers to tracemalloc) plus the total bytes allocated
+for per-layer arrays.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory --size 10 --k 15 --dot-size 3
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.synthetic import image_side
+from utils.assign import label_dtype
+from utils.layer_exporter import export_layers, rgb_to_hex
+
+METADATA = {'dpi': (300, 300), 'format': 'PNG'}
+
+
+def legacy_export(labels, centers, out_dir, dot_size):
+    """Per-layer temporaries as the exporter used to allocate them"""
+    h, w = labels.shape
+    for i, color in enumerate(centers):
+        mask = (labels == i).astype(np.uint8) * 255
+        layer = np.zeros((h, w, 4), dtype=np.uint8)
+        hit = mask > 0
+        if dot_size > 1:
+            padded = np.pad(hit, dot_size // 2)
+            grown = np.zeros_like(hit)
+            for dy in range(dot_size):
+                for dx in range(dot_size):
+                    grown |= padded[dy:dy + h, dx:dx + w]
+            hit = grown
+        if not hit.any():
+            continue
+        layer[hit] = (*color, 255)
+        Image.fromarray(layer, 'RGBA').save(f"{out_dir}/layer_{i+1}_{rgb_to_hex(color)}.png",
+                                            format='PNG', compress_level=6, dpi=METADATA['dpi'])
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=float, default=10, help='megapixels')
+    parser.add_argument('--k', type=int, default=15)
+    parser.add_argument('--dot-size', type=int, default=3)
+    args = parser.parse_args()
+
+    h = w = image_side(args.size)
+    rng = np.random.default_rng(0)
+    centers = rng.integers(0, 256, size=(args.k, 3))
+    labels_compact = rng.integers(0, args.k, size=(h, w)).astype(label_dtype(args.k))
+    labels_legacy = labels_compact.astype(np.int64)
+
+    out_root = tempfile.mkdtemp(prefix='bench_memory_')
+    try:
+        legacy_dir = os.path.join(out_root, 'legacy')
+        compact_dir = os.path.join(out_root, 'compact')
+        os.makedirs(legacy_dir)
+        t_legacy, peak_legacy = measure(legacy_export, labels_legacy, centers, legacy_dir, args.dot_size)
+        t_compact, peak_compact = measure(export_layers, labels_compact, centers, compact_dir,
+                                          METADATA, args.dot_size, 1)
+    finally:
+        shutil.rmtree(out_root)
+
+    per_layer = h * w * (8 + 1 + 4 + 1)  # int64 compare result, uint8 mask, RGBA layer, bool hit
+    print(f"{h * w / 1e6:.1f} MP, k={args.k}, dot_size={args.dot_size}")
+    print(f"{'label map':>16} int64 {labels_legacy.nbytes / 2**20:8.1f} MB   "
+          f"{labels_compact.dtype} {labels_compact.nbytes / 2**20:8.1f} MB")
+    print(f"{'legacy export':>16} {t_legacy:7.3f} s  peak {peak_legacy / 2**20:8.1f} MB  "
+          f"~{per_layer * args.k / 2**20:.0f} MB allocated in per-layer temporaries")
+    per_layer_compact = h * w * 2 if args.dot_size > 1 else 0  # dilation rows/out
+    print(f"{'compact export':>16} {t_compact:7.3f} s  peak {peak_compact / 2**20:8.1f} MB  "
+          f"~{per_layer_compact * args.k / 2**20:.0f} MB allocated in per-layer temporaries")
+
+
+if __name__ == '__main__':
+    main()
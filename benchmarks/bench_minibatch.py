@@ -0,0 +1,78 @@
+"""Quality versus speed of the mini-batch backend against full-batch kmeans_cpu.
+
+Inertia is measured in the fitting space (Lab when --lab) on a common
+evaluation sample. Palette ΔE (CIE76) pairs each full-batch center with a
+mini-batch center by optimal assignment.
+
+Run from the repository root:
+    python -m benchmarks.bench_minibatch --image image-target.png --k 15 --lab
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from skimage.color import rgb2lab, deltaE_cie76
+
+from utils.image_loader import load_image
+from utils.kmeans_cpu import kmeans_cpu, kmeans_minibatch_cpu
+
+
+def inertia(points, centers):
+    distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    return distances.min(axis=1).sum() / len(points)
+
+
+def to_space(rgb, use_lab_space):
+    rgb = np.asarray(rgb, dtype=np.uint8).reshape((-1, 3))
+    return rgb2lab(rgb) if use_lab_space else rgb.astype(float)
+
+
+def run(fn, *args, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, centers = fn(*args, **kwargs)
+    return time.perf_counter() - start, centers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='image-target.png')
+    parser.add_argument('--k', type=int, default=15)
+    parser.add_argument('--lab', action='store_true')
+    parser.add_argument('--ensure-green', action='store_true')
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1024, 4096, 16384])
+    parser.add_argument('--epochs', type=int, default=2)
+    args = parser.parse_args()
+
+    data = load_image(args.image)['array']
+    flat_data = data.reshape((-1, 3))
+    rng = np.random.default_rng(0)
+    eval_points = to_space(flat_data[rng.choice(len(flat_data), 50_000, replace=False)], args.lab)
+    options = dict(ensure_green=args.ensure_green, use_lab_space=args.lab)
+
+    np.random.seed(42)
+    t_full, centers_full = run(kmeans_cpu, data, args.k, precision_mode=True, **options)
+    ref_centers = to_space(centers_full, args.lab)
+    ref_inertia = inertia(eval_points, ref_centers)
+
+    print(f"{flat_data.shape[0] / 1e6:.1f} MP, k={args.k}, lab={args.lab}, ensure_green={args.ensure_green}")
+    print(f"{'backend':>16} {'time s':>8} {'speedup':>8} {'inertia':>10} {'vs full':>8} {'mean ΔE':>8} {'max ΔE':>8}")
+    print(f"{'full batch':>16} {t_full:>8.2f} {1:>7.1f}x {ref_inertia:>10.2f} {'':>8} {'':>8} {'':>8}")
+    for batch_size in args.batch_size:
+        np.random.seed(42)
+        t_mb, centers_mb = run(kmeans_minibatch_cpu, data, args.k, batch_size=batch_size, epochs=args.epochs, **options)
+        mb_inertia = inertia(eval_points, to_space(centers_mb, args.lab))
+        lab_full = rgb2lab(centers_full.reshape((-1, 1, 3))).reshape((-1, 3))
+        lab_mb = rgb2lab(centers_mb.reshape((-1, 1, 3))).reshape((-1, 3))
+        cost = deltaE_cie76(lab_full[:, None, :], lab_mb[None, :, :])
+        rows, cols = linear_sum_assignment(cost)
+        delta_e = cost[rows, cols]
+        print(f"{'mini-batch ' + str(batch_size):>16} {t_mb:>8.2f} {t_full / t_mb:>7.1f}x {mb_inertia:>10.2f} "
+              f"{mb_inertia / ref_inertia - 1:>+7.1%} {delta_e.mean():>8.2f} {delta_e.max():>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Compare precision_mode fit samples: the old N//5 budget and the samplers.
+
+For each strategy, times kmeans_cpu on the image and on a 2x2 tiled copy
+(4x the pixels), checks that two runs give identical labels, and reports
+the worst-matched color: the largest distance from any distinct image
+color holding at least --min-pixels pixels to its nearest center.
+
+Run from the repository root:
+    python -m benchmarks.bench_sampling --image image-target.png --k 15
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from utils.color_histogram import unique_colors
+from utils.image_loader import load_image
+from utils.kmeans_cpu import kmeans_cpu
+
+
+def fit(data, k, sample_size, strategy):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        labels, centers = kmeans_cpu(data, k, ensure_green=True, precision_mode=True, use_lab_space=True,
+                                     sample_size=sample_size, sample_strategy=strategy)
+    return time.perf_counter() - start, labels, centers
+
+
+def worst_color(data, centers, min_pixels):
+    colors, counts, _ = unique_colors(data.reshape((-1, 3)))
+    colors = colors[counts >= min_pixels].astype(np.float32)
+    distances = np.linalg.norm(colors[:, None, :] - centers[None].astype(np.float32), axis=2)
+    return float(distances.min(axis=1).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='image-target.png')
+    parser.add_argument('--k', type=int, default=15)
+    parser.add_argument('--sample-size', type=int, default=200_000)
+    parser.add_argument('--min-pixels', type=int, default=200)
+    args = parser.parse_args()
+
+    data = load_image(args.image)['array']
+    large = np.tile(data, (2, 2, 1))
+    runs = [('N//5 uniform', None, 'uniform')]
+    runs += [(strategy, args.sample_size, strategy) for strategy in ['uniform', 'tile', 'histogram']]
+
+    print(f"{data.shape[0] * data.shape[1] / 1e6:.1f} MP and {large.shape[0] * large.shape[1] / 1e6:.1f} MP, "
+          f"k={args.k}, budget {args.sample_size}")
+    print(f"{'sampler':>13} {'1x fit s':>9} {'4x fit s':>9} {'repeatable':>11} {'worst color':>12}")
+    for name, sample_size, strategy in runs:
+        t_small, labels, centers = fit(data, args.k, sample_size, strategy)
+        _, again, _ = fit(data, args.k, sample_size, strategy)
+        t_large, _, _ = fit(large, args.k, sample_size, strategy)
+        worst = worst_color(data, centers, args.min_pixels)
+        print(f"{name:>13} {t_small:9.2f} {t_large:9.2f} {str(np.array_equal(labels, again)):>11} {worst:12.1f}")
+
+
+if __name__ == '__main__':
+    main()
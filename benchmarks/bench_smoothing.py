@@ -0,0 +1,68 @@
+"""Compare the per-layer GaussianBlur loop with the tiled smoothing engine.
+
+Times only mask building and smoothing (no PNG encoding) on the GMM
+soft-mask stack of an image, and checks that "probability" mode output
+is identical to the old loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_smoothing --image image-target.png --k 15 --radius 1.5
+"""
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from utils.gmm_cpu import gmm_soft_cpu
+from utils.image_loader import load_image
+from utils.layer_exporter import build_label_index
+from utils.smoothing import iter_smooth_layers
+
+
+def legacy_smooth(labels, stack, radius):
+    """The loop export_smooth_layers used before the smoothing engine"""
+    for i in range(len(stack)):
+        mask_hard = (labels == i).astype(np.uint8) * 255
+        soft = np.asarray(Image.fromarray(stack[i]).filter(ImageFilter.GaussianBlur(radius=radius)))
+        yield i, soft, mask_hard
+
+
+def run(layers):
+    start = time.perf_counter()
+    outputs = [soft.copy() for _, soft, _ in layers]
+    return time.perf_counter() - start, outputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='image-target.png')
+    parser.add_argument('--k', type=int, default=15)
+    parser.add_argument('--radius', type=float, default=1.5)
+    args = parser.parse_args()
+
+    data = load_image(args.image)['array']
+    with contextlib.redirect_stdout(io.StringIO()):
+        labels, _, stack = gmm_soft_cpu(data, args.k, 'full', use_histogram=True)
+    h, w = labels.shape
+    megapixels = args.k * h * w / 1e6
+
+    t_legacy, expected = run(legacy_smooth(labels, stack, args.radius))
+    results = [('per-layer loop', t_legacy, True)]
+    for mode in ['probability', 'antialias']:
+        start = time.perf_counter()
+        order, offsets = build_label_index(labels, args.k)
+        t_index = time.perf_counter() - start
+        t_mode, outputs = run(iter_smooth_layers(order, offsets, (h, w), stack, args.radius, mode, report=False))
+        identical = all(np.array_equal(a, b) for a, b in zip(expected, outputs)) if mode == 'probability' else None
+        results.append((mode, t_index + t_mode, identical))
+
+    print(f"{h * w / 1e6:.1f} MP x {args.k} layers, radius {args.radius}")
+    for name, seconds, identical in results:
+        same = '' if identical is None else f"  identical {identical}"
+        print(f"{name:>15} {seconds:7.3f} s {megapixels / seconds:7.0f} MP/s {t_legacy / seconds:5.1f}x{same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Compare fitting on every pixel with fitting on the unique-color histogram.
+
+Run from the repository root:
+    python -m benchmarks.bench_unique_colors --image image-target.png --k 15
+"""
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.synthetic import flat_artwork
+from utils.image_loader import load_image
+from utils.kmeans_cpu import kmeans_cpu
+
+
+def time_kmeans(data, k, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        kmeans_cpu(data, k, ensure_green=True, use_lab_space=True, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default='image-target.png')
+    parser.add_argument('--k', type=int, default=15)
+    parser.add_argument('--art-megapixels', type=float, default=4.2)
+    args = parser.parse_args()
+
+    cases = [
+        ('flat artwork', flat_artwork(args.art_megapixels)),
+        (args.image, load_image(args.image)['array']),
+    ]
+    print(f"{'input':>20} {'MP':>5} {'precision s':>12} {'histogram s':>12} {'speedup':>8}")
+    for name, data in cases:
+        t_pixels = time_kmeans(data, args.k, precision_mode=True)
+        t_hist = time_kmeans(data, args.k, use_histogram=True)
+        mp = data.shape[0] * data.shape[1] / 1e6
+        print(f"{name:>20} {mp:>5.1f} {t_pixels:>12.2f} {t_hist:>12.2f} {t_pixels / t_hist:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Benchmark suite with JSON baselines and regression detection.
+
+Times precision-mode KMeans, gmm_cpu (hard and soft paths), export_layers
+and export_smooth_layers on synthetic flat-artwork and photographic images
+across K and dot_size. Runs offline on CPU only. The kmeans_sampled case
+times cluster_image as main.py runs it: fitted on FIT_SAMPLE_SIZE pixels
+drawn with SAMPLE_STRATEGY and SAMPLE_SEED, with the Lab and green
+seeding settings of config.py. The GMM paths fitted
+on every pixel (the FIT_ON_UNIQUE_COLORS = False default) are slow, so
+they only run up to --full-gmm-max-mp; the *_histogram cases run at
+every size.
+
+Run from the repository root:
+    python -m benchmarks.suite --sizes 1 10 50 --save-baseline benchmarks/baseline.json
+    python -m benchmarks.suite --sizes 1 10 50 --baseline benchmarks/baseline.json --threshold 0.25
+
+With --baseline the process exits with status 1 when any case is slower
+than baseline * (1 + threshold) and also more than --min-delta seconds
+slower, so sub-second noise does not fail the run.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import sklearn
+
+from benchmarks.synthetic import GENERATORS
+from utils.gmm_cpu import gmm_cpu, gmm_labels_cpu, gmm_soft_cpu
+from utils.pipeline import cluster_image, load_settings
+from utils.layer_exporter import export_layers, export_smooth_layers
+
+STAGES = ('kmeans', 'gmm', 'export_layers', 'export_smooth_layers')
+METADATA = {'dpi': (300, 300), 'format': 'PNG'}
+
+
+def best_of(repeat, fn, *args, **kwargs):
+    """Minimum wall time over `repeat` runs and the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_suite(sizes, kinds, ks, dot_sizes, stages, repeat=1, log=print, full_gmm_max_mp=1):
+    """Return {case_name: seconds} for every requested combination"""
+    results = {}
+    kmeans_settings = dict(CLUSTER_ALGORITHM="kmeans", KMEANS_PRECISION_MODE=True, FIT_ON_UNIQUE_COLORS=False)
+    out_root = tempfile.mkdtemp(prefix='color-separation-bench-')
+    try:
+        for mp in sizes:
+            for kind in kinds:
+                data = GENERATORS[kind](mp)
+                for k in ks:
+                    prefix = f"{kind}/{mp:g}MP/k{k}"
+
+                    def record(name, seconds):
+                        results[f"{name}/{prefix}"] = round(seconds, 4)
+                        log(f"{name + '/' + prefix:<45} {seconds:>9.3f} s")
+
+                    labels = centers = None
+                    if 'kmeans' in stages or 'export_layers' in stages:
+                        settings = load_settings(NUM_COLORS=k, **kmeans_settings)
+                        seconds, (labels, centers, _) = best_of(repeat, cluster_image, {'array': data}, settings)
+                        if 'kmeans' in stages:
+                            record('kmeans_sampled', seconds)
+                    if 'gmm' in stages:
+                        seconds, _ = best_of(repeat, gmm_labels_cpu, data, k, 'full', use_histogram=True)
+                        record('gmm_histogram', seconds)
+                        if mp <= full_gmm_max_mp:
+                            seconds, _ = best_of(repeat, gmm_labels_cpu, data, k, 'full')
+                            record('gmm', seconds)
+                            seconds, _ = best_of(repeat, gmm_soft_cpu, data, k, 'full')
+                            record('gmm_soft', seconds)
+                            seconds, _ = best_of(repeat, gmm_cpu, data, k, 'full')
+                            record('gmm_cpu', seconds)
+                    if 'export_layers' in stages:
+                        for dot_size in dot_sizes:
+                            out_dir = os.path.join(out_root, 'layers')
+                            seconds, _ = best_of(repeat, export_layers, labels, centers, out_dir, METADATA, dot_size)
+                            shutil.rmtree(out_dir)
+                            record(f"export_layers_dot{dot_size}", seconds)
+                    if 'export_smooth_layers' in stages:
+                        seconds, (soft_labels, soft_centers, soft) = best_of(
+                            repeat, gmm_soft_cpu, data, k, 'full', use_histogram=True
+                        )
+                        record('gmm_soft_histogram', seconds)
+                        out_dir = os.path.join(out_root, 'smooth')
+                        seconds, _ = best_of(
+                            repeat, export_smooth_layers, soft_labels, soft_centers, soft, out_dir, 1.5, METADATA
+                        )
+                        shutil.rmtree(out_dir)
+                        record('export_smooth_layers', seconds)
+    finally:
+        shutil.rmtree(out_root, ignore_errors=True)
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scikit-learn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold, min_delta):
+    """List of (case, baseline_s, current_s) that regressed beyond the threshold"""
+    regressions = []
+    for case, seconds in results.items():
+        base = baseline.get(case)
+        if base is None:
+            continue
+        if seconds > base * (1 + threshold) and seconds - base > min_delta:
+            regressions.append((case, base, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 10, 50], help='megapixels')
+    parser.add_argument('--kinds', nargs='+', default=sorted(GENERATORS), choices=sorted(GENERATORS))
+    parser.add_argument('--k', type=int, nargs='+', default=[8, 15])
+    parser.add_argument('--dot-size', type=int, nargs='+', default=[1, 3])
+    parser.add_argument('--stages', nargs='+', default=list(STAGES), choices=STAGES)
+    parser.add_argument('--repeat', type=int, default=1, help='best of N runs per case')
+    parser.add_argument('--full-gmm-max-mp', type=float, default=1,
+                        help='largest size for the GMM cases fitted on every pixel')
+    parser.add_argument('--output', help='write this run as JSON')
+    parser.add_argument('--save-baseline', metavar='PATH', help='store this run as the new baseline')
+    parser.add_argument('--baseline', metavar='PATH', help='compare against a stored baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative slowdown')
+    parser.add_argument('--min-delta', type=float, default=0.05, help='ignore slowdowns below this many seconds')
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes, args.kinds, args.k, args.dot_size, args.stages, args.repeat,
+                        full_gmm_max_mp=args.full_gmm_max_mp)
+    report = {'environment': environment(), 'results': results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('environment') != report['environment']:
+            print("⚠️ Baseline was recorded in a different environment, comparison may be noisy")
+        regressions = compare(results, baseline['results'], args.threshold, args.min_delta)
+        for case, base, seconds in regressions:
+            print(f"❌ {case}: {base:.3f} s -> {seconds:.3f} s ({seconds / base - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No stage regressed more than {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
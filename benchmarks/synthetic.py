@@ -0,0 +1,35 @@
+"""Deterministic synthetic test images for the benchmarks."""
+import numpy as np
+
+
+def image_side(megapixels):
+    """Side of a square image with roughly the given pixel count"""
+    return max(1, int(round((megapixels * 1e6) ** 0.5)))
+
+
+def flat_artwork(megapixels, n_colors=40, block=32, seed=0):
+    """Blocky image with a small palette, like vector artwork for screen printing"""
+    side = image_side(megapixels)
+    rng = np.random.default_rng(seed)
+    palette = rng.integers(0, 256, (n_colors, 3), dtype=np.uint8)
+    coarse = rng.integers(0, n_colors, (side // block + 1, side // block + 1))
+    return palette[np.kron(coarse, np.ones((block, block), dtype=coarse.dtype))[:side, :side]]
+
+
+def photo_noise(megapixels, seed=0):
+    """Smooth color gradients plus sensor-like noise, so nearly every pixel is distinct"""
+    side = image_side(megapixels)
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:side, 0:side].astype(np.float32) / side
+    image = np.empty((side, side, 3), dtype=np.float32)
+    for c in range(3):
+        fx, fy, phase = rng.uniform(1, 6), rng.uniform(1, 6), rng.uniform(0, np.pi)
+        image[..., c] = 127.5 + 100 * np.sin(2 * np.pi * (fx * x + fy * y) + phase)
+    image += rng.normal(0, 12, image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+GENERATORS = {
+    'flat': flat_artwork,
+    'photo': photo_noise,
+}
@@ -0,0 +1,29 @@
+import unittest
+from benchmarks.suite import compare, run_suite
+
+class TestSuite(unittest.TestCase):
+    def test_compare(self):
+        """Only cases slower by both the threshold and min_delta regress"""
+        baseline = {'a': 1.0, 'b': 1.0, 'c': 0.01, 'd': 2.0}
+        results = {'a': 1.3, 'b': 1.2, 'c': 0.03, 'd': 1.0, 'new': 9.0}
+        self.assertEqual(compare(results, baseline, 0.25, 0.05), [('a', 1.0, 1.3)])
+        self.assertEqual(compare(results, baseline, 0.1, 0.0),
+                         [('a', 1.0, 1.3), ('b', 1.0, 1.2), ('c', 0.01, 0.03)])
+        self.assertEqual(compare(results, {}, 0.25, 0.05), [])
+
+    def test_gmm_cases(self):
+        """Full-pixel GMM cases run only up to full_gmm_max_mp"""
+        results = run_suite([0.01, 0.02], ['flat'], [3], [1], ['gmm'], log=lambda line: None,
+                            full_gmm_max_mp=0.01)
+        self.assertEqual(sorted(results), [
+            'gmm/flat/0.01MP/k3', 'gmm_cpu/flat/0.01MP/k3', 'gmm_histogram/flat/0.01MP/k3',
+            'gmm_histogram/flat/0.02MP/k3', 'gmm_soft/flat/0.01MP/k3',
+        ])
+
+    def test_kmeans_case(self):
+        """KMeans is timed on the sampled precision path under its own name"""
+        results = run_suite([0.01], ['flat'], [3], [1], ['kmeans'], log=lambda line: None)
+        self.assertEqual(sorted(results), ['kmeans_sampled/flat/0.01MP/k3'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,12 +3,42 @@ OUTPUT_DIR = "output_layers"
 OUTPUT_SMOOTH_DIR = "output_smooth_layers"
 
 NUM_COLORS = 15
+NUM_COLORS_SWEEP = None  # mis. [8, 10, 12, 15]: coba beberapa NUM_COLORS sekaligus (kmeans)
 DOT_SIZE = 1
-CLUSTER_ALGORITHM = "kmeans"  # "kmeans" or "gmm"
+EXPORT_WORKERS = 4  # Jumlah layer yang di-render & disimpan bersamaan
+EXPORT_FORMAT = "png"  # "png" (RGBA per layer), "indexed" (1 PNG palet) atau "tiff" (multi-page 1-bit)
+EXPORT_CROP = False    # True: potong layer PNG ke bounding box, offset di layers.json
+CLUSTER_ALGORITHM = "kmeans"  # "kmeans", "minibatch" or "gmm"
+MINIBATCH_SIZE = 4096  # Pixel per batch untuk "minibatch"
 GMM_BLUR_RADIUS = 1.5  # Atur level blur
+GMM_SMOOTH_MODE = "probability"  # "antialias": blur dari hard mask, tepi halus & total coverage tetap
 GMM_COVARIANCE_TYPE = 'full'  # 'full'/'tied'/'diag'
 GMM_EXPORT_SMOOTH = False
 
 KMEANS_PRECISION_MODE = True  # False untuk lebih cepat
 FORCE_GREEN_COLOR = True      # Prioritaskan hijau
-USE_LAB_COLORSPACE = True 
\ No newline at end of file
+USE_LAB_COLORSPACE = True
+FIT_ON_UNIQUE_COLORS = False  # True: fit pada histogram warna unik (jauh lebih cepat untuk artwork flat)
+
+DESPECKLE = False          # True: bersihkan piksel/bintik terisolasi sebelum export
+DESPECKLE_MODE_SIZE = 3    # Jendela mode filter (ganjil, 0 untuk mematikan)
+DESPECKLE_MIN_AREA = 16    # Komponen lebih kecil dari ini (px) digabung ke sekitarnya, 0 untuk mematikan
+
+TILED_MODE = False  # True: fit & export per band. Memori benar-benar terbatas hanya untuk input .npy/.raw;
+                    # PNG/JPEG tetap di-decode utuh sekali oleh Pillow (8-bit, tanpa buffer float)
+TILE_ROWS = 512
+FIT_SAMPLE_SIZE = 200_000     # Jumlah piksel sampel untuk fitting (precision mode, tiled, sweep)
+SAMPLE_STRATEGY = "uniform"   # "uniform", "tile" (merata di gambar) atau "histogram" (per bin warna)
+SAMPLE_SEED = 42              # Seed sampling (juga mini-batch), hasil sama untuk input yang sama
+
+PALETTE_CACHE_DIR = ".palette_cache"  # None untuk menonaktifkan cache
+PALETTE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+METRICS_PATH = None  # mis. "metrics.json": waktu, peak RSS & bytes per tahap
+PROFILE_PATH = None  # mis. "run.prof": dump cProfile
+
+SERVICE_HOST = "127.0.0.1"  # serve.py: alamat HTTP service
+SERVICE_PORT = 8765
+SERVICE_WORKERS = 1       # Job yang diproses bersamaan
+SERVICE_MAX_QUEUE = 8     # Job yang boleh menunggu; lebih dari ini dibalas 503
+SERVICE_MAX_UPLOAD_BYTES = 200 * 1024 ** 2
@@ -0,0 +1,33 @@
+import argparse
+
+import config
+from utils.service import SeparationService, make_server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keep a warm separation process behind a local HTTP endpoint"
+    )
+    parser.add_argument('--host', default=config.SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=config.SERVICE_PORT)
+    parser.add_argument('--workers', type=int, default=config.SERVICE_WORKERS, help="jobs processed at once")
+    parser.add_argument('--max-queue', type=int, default=config.SERVICE_MAX_QUEUE,
+                        help="jobs allowed to wait before requests get 503")
+    args = parser.parse_args()
+
+    service = SeparationService(workers=args.workers, max_queue=args.max_queue)
+    service.start()
+    server = make_server(service, args.host, args.port, config.SERVICE_MAX_UPLOAD_BYTES)
+    print(f"🚀 Serving on http://{args.host}:{server.server_port} "
+          f"({args.workers} workers, queue {args.max_queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import numpy as np
+
+from utils.color_histogram import pack_rgb, unpack_rgb, unique_colors
+
+
+def label_dtype(k):
+    """Smallest unsigned dtype for labels 0..k-1, keeping the max value free as a sentinel"""
+    if k <= np.iinfo(np.uint8).max:
+        return np.uint8
+    if k <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.uint32
+
+
+def nearest_center(points, centers, chunk_size=4096):
+    """Index of the closest center for each point, in float32 chunks.
+
+    Uses |x|^2 - 2 x.c + |c|^2 so each chunk is one small matrix product;
+    |x|^2 is constant per row and can be dropped for the argmin.
+    """
+    centers = np.asarray(centers, dtype=np.float32)
+    center_norms = (centers ** 2).sum(axis=1)
+    projection = -2 * centers.T
+    labels = np.empty(len(points), dtype=label_dtype(len(centers)))
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float32)
+        distances = chunk @ projection
+        distances += center_norms
+        labels[start:start + chunk_size] = distances.argmin(axis=1)
+    return labels
+
+
+def assign_labels(flat_data, predict_fn, k=None):
+    """Label (N, 3) uint8 pixels by calling predict_fn once per distinct color.
+
+    With k the labels are narrowed to label_dtype(k) before the gather, so the
+    full-size label map is never wider than it needs to be.
+    """
+    colors, _, inverse = unique_colors(flat_data)
+    labels = np.asarray(predict_fn(colors))
+    if k is not None:
+        labels = labels.astype(label_dtype(k), copy=False)
+    return labels[inverse]
+
+
+class LabelCache:
+    """Lazily filled RGB -> label table for one fitted model.
+
+    Every 24-bit color is predicted at most once, so repeated calls (row
+    bands of a tiled run, or several images sharing a palette) only pay for
+    colors they have not seen yet. The table costs 16 MB for k < 255.
+    """
+
+    def __init__(self, predict_fn, k):
+        self.predict_fn = predict_fn
+        dtype = label_dtype(k)
+        self.unset = np.iinfo(dtype).max
+        self.table = np.full(1 << 24, self.unset, dtype=dtype)
+
+    def __call__(self, flat_data):
+        keys = pack_rgb(flat_data)
+        labels = self.table[keys]
+        missing = labels == self.unset
+        if missing.any():
+            new_keys = np.unique(keys[missing])
+            self.table[new_keys] = self.predict_fn(unpack_rgb(new_keys))
+            labels[missing] = self.table[keys[missing]]
+        return labels
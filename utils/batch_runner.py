@@ -0,0 +1,195 @@
+import contextlib
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from threadpoolctl import threadpool_limits
+
+from utils import metrics
+from utils.lab_lut import load_lab_lut
+from utils.pipeline import load_settings, separate_image
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.webp')
+MANIFEST_EXTENSIONS = ('.txt', '.lst')
+DONE_MARKER = 'job.json'
+
+_settings = None
+_thread_limits = None
+
+
+def collect_inputs(sources):
+    """Expand directories, glob patterns and manifest files into image paths"""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            names = sorted(os.listdir(source))
+            paths += [os.path.join(source, n) for n in names if n.lower().endswith(IMAGE_EXTENSIONS)]
+        elif source.lower().endswith(MANIFEST_EXTENSIONS) and os.path.isfile(source):
+            base = os.path.dirname(source)
+            with open(source) as manifest:
+                for line in manifest:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        paths.append(os.path.join(base, line))
+        else:
+            paths += sorted(glob.glob(source, recursive=True))
+    return list(dict.fromkeys(paths))
+
+
+def job_dirs(paths, out_root):
+    """One output directory per image, named after the file stem.
+
+    A directory whose marker records this input is reused; one whose
+    marker records another input is never taken, so adding inputs to a
+    batch cannot hand an image another image's finished output.
+    """
+    dirs, used = [], set()
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        names = _stem_names(stem, used)
+        free = None
+        for name in names:
+            job_dir = os.path.join(out_root, name)
+            owner = _marker_input(job_dir)
+            if owner is not None and _same_input(owner, path):
+                free = name
+                break
+            if free is None and owner is None:
+                free = name
+            if not os.path.isdir(job_dir) and free is not None:
+                break
+        used.add(free)
+        dirs.append(os.path.join(out_root, free))
+    return dirs
+
+
+def _stem_names(stem, used):
+    """stem, stem_2, stem_3, ... skipping names already assigned"""
+    name, n = stem, 2
+    while True:
+        if name not in used:
+            yield name
+        name, n = f"{stem}_{n}", n + 1
+
+
+def _marker_input(job_dir):
+    try:
+        with open(os.path.join(job_dir, DONE_MARKER)) as f:
+            return json.load(f).get('input')
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _same_input(a, b):
+    return os.path.abspath(a) == os.path.abspath(b)
+
+
+def is_done(job_dir, path=None):
+    """True when job_dir holds a finished job (for `path`, when given)"""
+    owner = _marker_input(job_dir)
+    return owner is not None and (path is None or _same_input(owner, path))
+
+
+def _init_worker(overrides, threads=None):
+    """Load settings and warm shared state once per worker process.
+
+    `threads` caps the native (BLAS/OpenMP) threads and EXPORT_WORKERS of
+    a pool worker, so many workers do not oversubscribe the CPU.
+    """
+    global _settings, _thread_limits
+    _settings = load_settings(**overrides)
+    if threads is not None:
+        _thread_limits = threadpool_limits(threads)
+        _settings.EXPORT_WORKERS = max(1, min(_settings.EXPORT_WORKERS, threads))
+    if _settings.USE_LAB_COLORSPACE:
+        load_lab_lut()
+
+
+def _run_job(path, job_dir):
+    os.makedirs(job_dir, exist_ok=True)
+    start = time.perf_counter()
+    record = {'input': path, 'output': job_dir}
+    try:
+        report_path = os.path.join(job_dir, 'metrics.json') if _settings.METRICS_PATH else None
+        profile_path = os.path.join(job_dir, 'profile.prof') if _settings.PROFILE_PATH else None
+        with open(os.path.join(job_dir, 'job.log'), 'w') as log, contextlib.redirect_stdout(log), \
+                metrics.session(report_path, profile_path):
+            centers = separate_image(
+                path,
+                os.path.join(job_dir, 'layers'),
+                os.path.join(job_dir, 'smooth_layers'),
+                _settings
+            )
+        record.update(status='done', seconds=round(time.perf_counter() - start, 3),
+                      centers=['{:02x}{:02x}{:02x}'.format(*c) for c in centers])
+        # The marker is written last and atomically, so a crash mid-job reruns it
+        tmp_path = os.path.join(job_dir, DONE_MARKER + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, indent=2)
+        os.replace(tmp_path, os.path.join(job_dir, DONE_MARKER))
+    except Exception as e:
+        record.update(status='failed', seconds=round(time.perf_counter() - start, 3), error=repr(e))
+    return record
+
+
+def run_batch(sources, out_root, workers=None, force=False, overrides=None):
+    """Separate many images across a process pool, skipping completed outputs.
+
+    Writes <out_root>/batch_summary.json and returns the summary dict.
+    """
+    overrides = overrides or {}
+    paths = collect_inputs(sources)
+    dirs = job_dirs(paths, out_root)
+    os.makedirs(out_root, exist_ok=True)
+    records = {}
+    todo = []
+    for path, job_dir in zip(paths, dirs):
+        if not force and is_done(job_dir, path):
+            with open(os.path.join(job_dir, DONE_MARKER)) as f:
+                records[path] = dict(json.load(f), status='skipped')
+        else:
+            todo.append((path, job_dir))
+
+    print(f"🗂️ {len(paths)} images, {len(paths) - len(todo)} already done, {len(todo)} to process")
+    if todo and load_settings(**overrides).USE_LAB_COLORSPACE:
+        # Build the shared Lab table once here; workers only memory-map it
+        load_lab_lut()
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(todo) <= 1:
+        _init_worker(overrides)
+        for path, job_dir in todo:
+            records[path] = _report(_run_job(path, job_dir))
+    else:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(overrides, threads)) as pool:
+            futures = [pool.submit(_run_job, path, job_dir) for path, job_dir in todo]
+            for future in as_completed(futures):
+                record = _report(future.result())
+                records[record['input']] = record
+
+    images = [records[path] for path in paths]
+    summary = {
+        'total_seconds': round(time.perf_counter() - start, 3),
+        'done': sum(r['status'] == 'done' for r in images),
+        'skipped': sum(r['status'] == 'skipped' for r in images),
+        'failed': sum(r['status'] == 'failed' for r in images),
+        'images': images,
+    }
+    with open(os.path.join(out_root, 'batch_summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    print(f"✅ Batch complete: {summary['done']} done, {summary['skipped']} skipped, "
+          f"{summary['failed']} failed in {summary['total_seconds']:.1f}s")
+    return summary
+
+
+def _report(record):
+    if record['status'] == 'done':
+        print(f"✅ {record['input']} -> {record['output']} ({record['seconds']:.2f}s)")
+    else:
+        print(f"❌ {record['input']} failed: {record['error']}")
+    return record
@@ -0,0 +1,41 @@
+import numpy as np
+from utils.metrics import timed
+
+DENSE_HISTOGRAM_MIN_PIXELS = 1 << 20
+
+
+def pack_rgb(flat_data):
+    """Pack (N, 3) uint8 RGB rows into uint32 keys 0xRRGGBB"""
+    flat_data = flat_data.astype(np.uint32, copy=False)
+    return (flat_data[:, 0] << 16) | (flat_data[:, 1] << 8) | flat_data[:, 2]
+
+
+def unpack_rgb(keys):
+    """Inverse of pack_rgb, returns (N, 3) uint8"""
+    return np.stack(((keys >> 16) & 0xFF, (keys >> 8) & 0xFF, keys & 0xFF), axis=1).astype(np.uint8)
+
+
+@timed('color_histogram')
+def unique_colors(flat_data):
+    """Collapse (N, 3) uint8 pixels to their distinct colors.
+
+    Returns (colors, counts, inverse) so that colors[inverse] == flat_data and
+    counts can be passed as sample weights when fitting on the histogram.
+    """
+    keys = pack_rgb(flat_data)
+    if len(keys) < DENSE_HISTOGRAM_MIN_PIXELS:
+        uniq, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        return unpack_rgb(uniq), counts, inverse.ravel()
+
+    # Counting over the whole 24-bit cube is linear and beats sorting on large images
+    counts = np.bincount(keys, minlength=1 << 24)
+    uniq = np.flatnonzero(counts).astype(np.uint32)
+    lookup = np.zeros(1 << 24, dtype=np.int32)
+    lookup[uniq] = np.arange(len(uniq), dtype=np.int32)
+    return unpack_rgb(uniq), counts[uniq], lookup[keys]
+
+
+def weighted_resample(colors, counts, size, seed=42):
+    """Draw `size` pixels from the histogram, for models without sample_weight"""
+    rng = np.random.default_rng(seed)
+    return colors[rng.choice(len(colors), size, p=counts / counts.sum())]
@@ -2,10 +2,13 @@ import numpy as np
 from sklearn.mixture import GaussianMixture
 from sklearn.preprocessing import StandardScaler
 
-def gmm_cpu(data, k, covariance_type, max_iter=200):
-    """GMM dengan covariance_type='full' dan normalisasi data"""
-    flat_data = data.reshape((-1, 3))
-    
+from utils.assign import label_dtype, assign_labels
+from utils.color_histogram import unique_colors, weighted_resample
+from utils.metrics import timed
+
+@timed('fit')
+def gmm_fit(flat_data, k, covariance_type, max_iter=200):
+    """Fit a GMM on normalized (N, 3) RGB samples, returns (gmm, scaler)"""
     scaler = StandardScaler()
     flat_data_scaled = scaler.fit_transform(flat_data)
     
@@ -17,11 +20,86 @@ def gmm_cpu(data, k, covariance_type, max_iter=200):
         tol=1e-5
     )
     gmm.fit(flat_data_scaled)
+    return gmm, scaler
+
+@timed('predict')
+def gmm_predict_labels(gmm, scaler, colors):
+    """Hard labels for (N, 3) RGB rows; pair with assign_labels or LabelCache"""
+    return gmm.predict(scaler.transform(colors))
+
+@timed('predict')
+def gmm_predict_chunked(gmm, scaler, flat_data, chunk_size=262_144):
+    """Labels and uint8 soft masks from one likelihood pass over float32 chunks.
+
+    Returns labels (N,) and a (K, N) uint8 stack quantized the same way
+    export_smooth_layers does, so the dense float64 (N, K) matrix is never
+    materialized; transient buffers are bounded by chunk_size.
+    """
+    n = len(flat_data)
+    labels = np.empty(n, dtype=label_dtype(gmm.n_components))
+    soft = np.empty((gmm.n_components, n), dtype=np.uint8)
+    for start in range(0, n, chunk_size):
+        stop = min(n, start + chunk_size)
+        chunk = scaler.transform(flat_data[start:stop].astype(np.float32))
+        probs = gmm.predict_proba(chunk).astype(np.float32)
+        labels[start:stop] = probs.argmax(axis=1)
+        soft[:, start:stop] = (probs * 255).astype(np.uint8).T
+    return labels, soft
+
+def gmm_centers(gmm, scaler):
+    """Component means as uint8 RGB"""
+    centers = scaler.inverse_transform(gmm.means_)
+    return np.clip(centers, 0, 255).astype(np.uint8)
+
+@timed('gmm_cpu')
+def gmm_cpu(data, k, covariance_type, max_iter=200):
+    """GMM dengan covariance_type='full' dan normalisasi data"""
+    flat_data = data.reshape((-1, 3))
+    
+    gmm, scaler = gmm_fit(flat_data, k, covariance_type, max_iter)
     
-    labels = gmm.predict(flat_data_scaled)
+    flat_data_scaled = scaler.transform(flat_data)
+    labels = gmm.predict(flat_data_scaled).astype(label_dtype(k))
     probs = gmm.predict_proba(flat_data_scaled)
     
-    centers = scaler.inverse_transform(gmm.means_)
-    centers = np.clip(centers, 0, 255).astype(np.uint8)
+    return labels, gmm_centers(gmm, scaler), probs
+
+@timed('gmm_soft_cpu')
+def gmm_soft_cpu(data, k, covariance_type, max_iter=200, chunk_size=262_144,
+                 use_histogram=False, fit_size=200_000):
+    """Like gmm_cpu, but returns (H, W) labels and a (K, H, W) uint8 soft-mask stack.
+
+    With use_histogram, GaussianMixture (which has no sample_weight) is fitted
+    on a count-weighted resample of the distinct colors, and responsibilities
+    are evaluated once per distinct color and gathered back to pixels.
+    """
+    h, w = data.shape[:2]
+    flat_data = data.reshape((-1, 3))
+    
+    if use_histogram:
+        colors, counts, inverse = unique_colors(flat_data)
+        fit_data = weighted_resample(colors, counts, min(fit_size, len(flat_data)))
+        gmm, scaler = gmm_fit(fit_data, k, covariance_type, max_iter)
+        labels, soft = gmm_predict_chunked(gmm, scaler, colors, chunk_size)
+        labels, soft = labels[inverse], soft[:, inverse]
+    else:
+        gmm, scaler = gmm_fit(flat_data, k, covariance_type, max_iter)
+        labels, soft = gmm_predict_chunked(gmm, scaler, flat_data, chunk_size)
+    
+    return labels.reshape((h, w)), gmm_centers(gmm, scaler), soft.reshape((k, h, w))
+
+@timed('gmm_labels_cpu')
+def gmm_labels_cpu(data, k, covariance_type, max_iter=200, use_histogram=False, fit_size=200_000):
+    """Hard-label GMM path, returns (H, W) labels and centers without soft masks"""
+    h, w = data.shape[:2]
+    flat_data = data.reshape((-1, 3))
+    
+    if use_histogram:
+        colors, counts, inverse = unique_colors(flat_data)
+        gmm, scaler = gmm_fit(weighted_resample(colors, counts, min(fit_size, len(flat_data))), k, covariance_type, max_iter)
+        labels = gmm_predict_labels(gmm, scaler, colors).astype(label_dtype(k))[inverse]
+    else:
+        gmm, scaler = gmm_fit(flat_data, k, covariance_type, max_iter)
+        labels = assign_labels(flat_data, lambda colors: gmm_predict_labels(gmm, scaler, colors), k)
     
-    return labels, centers, probs
\ No newline at end of file
+    return labels.reshape((h, w)), gmm_centers(gmm, scaler)
@@ -1,26 +1,198 @@
+import os
+
 from PIL import Image
 import numpy as np
 
+from utils.metrics import stage, timed
+from utils.sampling import color_bins, sample_indices
+
+RAW_EXTENSIONS = ('.raw', '.rgb')
+# Mapped inputs have no Pillow writer, save their outputs as PNG
+MAPPED_FORMATS = {'NPY': 'PNG', 'RAW': 'PNG'}
+
+
+class ImageHandle:
+    """Lazily opened RGB image.
+
+    Shape, DPI and format come from the file header, pixels are only
+    decoded by the read_* methods. `.npy` files and headerless `.raw`/`.rgb`
+    (H, W, 3) uint8 dumps are memory-mapped instead, so reads are slices of
+    the mapped file; `.raw` inputs need `shape=(h, w)`.
+    """
+
+    def __init__(self, path, shape=None):
+        self.path = path
+        self._image = None
+        self._array = None
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.npy':
+            self._array = np.load(path, mmap_mode='r')
+            self.format = 'NPY'
+        elif ext in RAW_EXTENSIONS:
+            if shape is None:
+                raise ValueError("Raw input needs shape=(height, width): " + path)
+            self._array = np.memmap(path, dtype=np.uint8, mode='r', shape=(shape[0], shape[1], 3))
+            self.format = 'RAW'
+        else:
+            self._image = Image.open(path)
+            self.format = self._image.format
+
+        if self._array is not None:
+            if self._array.dtype != np.uint8 or self._array.ndim != 3 or self._array.shape[2] != 3:
+                raise ValueError(f"Expected an (H, W, 3) uint8 array, got {self._array.shape} {self._array.dtype}")
+            self.height, self.width = self._array.shape[:2]
+            self.dpi = (72, 72)
+            self.mode = 'RGB'
+        else:
+            self.width, self.height = self._image.size
+            self.dpi = self._image.info.get('dpi', (72, 72))
+            self.mode = self._image.mode
+
+    @property
+    def shape(self):
+        return (self.height, self.width, 3)
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    @property
+    def is_mapped(self):
+        return self._array is not None
+
+    def close(self):
+        if self._image is not None:
+            self._image.close()
+        self._array = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def read(self):
+        """Full (H, W, 3) uint8 RGB array (a read-only view for mapped inputs)"""
+        if self._array is not None:
+            return self._array
+        return np.array(self._image.convert('RGB'))
+
+    def read_region(self, box):
+        """RGB pixels inside box=(left, top, right, bottom)"""
+        left, top, right, bottom = box
+        if self._array is not None:
+            return self._array[top:bottom, left:right]
+        with self._image.crop(box) as region, region.convert('RGB') as rgb:
+            return np.asarray(rgb)
+
+    def read_strided(self, step, band_rows=512):
+        """Every `step`-th row and column, shape (ceil(H/step), ceil(W/step), 3).
+
+        JPEGs are decoded at a reduced DCT scale through Pillow's draft mode,
+        other formats one row band at a time.
+        """
+        if step <= 1:
+            return self.read()
+        if self._array is not None:
+            return np.ascontiguousarray(self._array[::step, ::step])
+        scale = min(step & -step, 8)  # largest DCT scale (1/2, 1/4, 1/8) dividing step
+        if self.format == 'JPEG' and scale > 1:
+            with Image.open(self.path) as img:
+                img.draft('RGB', (-(-self.width // scale), -(-self.height // scale)))
+                if img.size == (-(-self.width // scale), -(-self.height // scale)):
+                    rgb = np.asarray(img.convert('RGB'))
+                    return np.ascontiguousarray(rgb[::step // scale, ::step // scale])
+        rows = []
+        for y0, y1, band, _ in self.iter_row_bands(band_rows):
+            first = -(-y0 // step) * step
+            rows.append(band[first - y0:y1 - y0:step, ::step])
+        return np.concatenate(rows)
+
+    def iter_row_bands(self, band_rows, halo=0):
+        """Yield (y0, y1, band, pad_top) RGB row bands.
+
+        `band` covers rows [y0 - pad_top, y1 + halo) clipped to the image, so
+        filters that need neighbouring rows can crop back to [y0, y1).
+        """
+        h = self.height
+        for y0 in range(0, h, band_rows):
+            y1 = min(h, y0 + band_rows)
+            top = max(0, y0 - halo)
+            bottom = min(h, y1 + halo)
+            with stage('load_image'):
+                band = self.read_region((0, top, self.width, bottom))
+            yield y0, y1, band, y0 - top
+
+    def sample_pixels(self, sample_size, band_rows=512, seed=42, strategy='uniform'):
+        """Sample up to `sample_size` RGB pixels with a utils.sampling strategy.
+
+        Gives the same pixels as sample_pixels() on the decoded array.
+        Mapped inputs gather them straight from the file, other formats
+        one row band at a time; "histogram" first reads every band once to
+        bin the colors.
+        """
+        h, w = self.height, self.width
+        bins = None
+        if strategy == 'histogram' and sample_size < h * w:
+            bins = np.concatenate([color_bins(band.reshape((-1, 3)))
+                                   for _, _, band, _ in self.iter_row_bands(band_rows)])
+        indices = sample_indices(h * w, sample_size, strategy, seed, (h, w), bins)
+        if self._array is not None:
+            return self._array.reshape((-1, 3))[indices]
+        samples = np.empty((len(indices), 3), dtype=np.uint8)
+        for y0, y1, band, _ in self.iter_row_bands(band_rows):
+            lo, hi = np.searchsorted(indices, [y0 * w, y1 * w])
+            samples[lo:hi] = band.reshape((-1, 3))[indices[lo:hi] - y0 * w]
+        return samples
+
+
+def open_image(path, shape=None):
+    """Open a lazy ImageHandle, nothing is decoded until a read_* call"""
+    return ImageHandle(path, shape)
+
+@timed('load_image')
 def load_image(path):
     """Load image with metadata"""
-    with Image.open(path) as img:
+    with open_image(path) as handle:
         return {
-            'array': np.array(img.convert('RGB')),
-            'dpi': img.info.get('dpi', (72, 72)),
-            'mode': img.mode,
-            'format': img.format
+            'array': handle.read(),
+            'dpi': handle.dpi,
+            'mode': handle.mode,
+            'format': handle.format
         }
 
 def save_image(array, path, metadata=None):
     """Save image with original metadata"""
     if metadata is None:
         metadata = {}
-    
-    img = Image.fromarray(array.astype(np.uint8))
+
+    # No copy for uint8 input, including memory-mapped arrays
+    img = Image.fromarray(np.asarray(array).astype(np.uint8, copy=False))
+    image_format = metadata.get('format', 'PNG')
     save_args = {
-        'format': metadata.get('format', 'PNG'),
+        'format': MAPPED_FORMATS.get(image_format, image_format),
         'dpi': metadata.get('dpi', (72, 72))
     }
-    
+
     img.save(path, **save_args)
-    img.close()
\ No newline at end of file
+    img.close()
+
+def read_image_info(path):
+    """Read size and metadata without converting the pixel data"""
+    with open_image(path) as handle:
+        return {
+            'size': handle.size,
+            'dpi': handle.dpi,
+            'mode': handle.mode,
+            'format': handle.format
+        }
+
+def iter_row_bands(path, band_rows, halo=0):
+    """Yield (y0, y1, band, pad_top) RGB row bands of an image file"""
+    with open_image(path) as handle:
+        yield from handle.iter_row_bands(band_rows, halo)
+
+def sample_image_pixels(path, sample_size, band_rows=512, seed=42, strategy='uniform'):
+    """Sample up to `sample_size` RGB pixels of an image file, one row band at a time"""
+    with open_image(path) as handle:
+        return handle.sample_pixels(sample_size, band_rows, seed, strategy)
@@ -1,55 +1,289 @@
 import numpy as np
-from sklearn.cluster import KMeans
-from skimage.color import rgb2lab, lab2rgb
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from skimage.color import lab2rgb
 
+from utils.assign import label_dtype, nearest_center, assign_labels, LabelCache
+from utils.color_histogram import unique_colors
+from utils.image_loader import ImageHandle
+from utils.lab_lut import rgb_to_lab
+from utils.metrics import timed
+from utils.sampling import sample_pixels, uniform_indices
 
-def kmeans_cpu(data, k, max_iter=20, ensure_green=False, precision_mode=False, use_lab_space=False):
-    original_shape = data.shape[:2]
-    flat_data = data.reshape((-1, 3))
-    
-    if precision_mode:
-        sample_size = len(flat_data) // 5
-        sampled_indices = np.random.choice(len(flat_data), sample_size, replace=False)
-        sampled_data = flat_data[sampled_indices]
-    else:
-        sampled_data = flat_data
-    
+
+def green_init_centers(sampled_data, k, use_lab_space=False, sample_weight=None, seed=None):
+    """Pure green first center, remaining centers drawn from the data"""
+    init_centers = np.zeros((k, sampled_data.shape[1]))
+    init_centers[0] = [0, 128, 0] if use_lab_space else [0, 255, 0]
+    if k > 1:
+        # Without a seed keep drawing from the global RNG, as callers expect
+        rng = np.random if seed is None else np.random.default_rng(seed)
+        p = None if sample_weight is None else sample_weight / sample_weight.sum()
+        init_centers[1:] = sampled_data[rng.choice(len(sampled_data), k-1, p=p)]
+    return init_centers
+
+
+@timed('fit')
+def kmeans_fit(sampled_data, k, max_iter=20, ensure_green=False, use_lab_space=False, sample_weight=None,
+               seed=None):
+    """Fit KMeans on (N, 3) RGB samples and return the fitted model"""
     if use_lab_space:
-        sampled_data = rgb2lab(sampled_data)
+        sampled_data = rgb_to_lab(sampled_data)
     
     if ensure_green:
-        init_centers = np.zeros((k, sampled_data.shape[1]))
-        init_centers[0] = [0, 128, 0] if use_lab_space else [0, 255, 0]
-        if k > 1:
-            init_centers[1:] = sampled_data[np.random.choice(len(sampled_data), k-1)]
+        init_centers = green_init_centers(sampled_data, k, use_lab_space, sample_weight, seed)
         n_init = 1
     else:
         init_centers = 'k-means++'
         n_init = 5
     
-    kmeans = KMeans(
+    return _new_kmeans(k, init_centers, n_init, max_iter).fit(sampled_data, sample_weight=sample_weight)
+
+
+def _new_kmeans(k, init, n_init, max_iter):
+    return KMeans(
         n_clusters=k,
-        init=init_centers,
+        init=init,
         max_iter=max_iter,
         tol=1e-6,
         n_init=n_init,
         random_state=42
-    ).fit(sampled_data)
+    )
+
+
+@timed('predict')
+def kmeans_predict(kmeans, flat_data, use_lab_space=False):
+    """Assign (N, 3) RGB pixels to the nearest fitted center"""
+    if use_lab_space:
+        flat_data = rgb_to_lab(flat_data)
+    return nearest_center(flat_data, kmeans.cluster_centers_)
+
+
+def kmeans_centers(kmeans, use_lab_space=False):
+    """Fitted centers as uint8 RGB"""
+    centers = kmeans.cluster_centers_
+    if use_lab_space:
+        centers = lab2rgb(centers) * 255
+    return np.clip(centers, 0, 255).astype(np.uint8)
+
+
+@timed('fit')
+def kmeans_minibatch_fit(batches, k, ensure_green=False, use_lab_space=False, batch_size=4096, seed=None):
+    """Fit MiniBatchKMeans incrementally with partial_fit on (M, 3) RGB batches.
+
+    `batches` can be any iterable (row bands of an array or of a file), so
+    the full image never has to be converted at once. `seed` seeds the
+    green init centers, like kmeans_fit.
+    """
+    kmeans = None
+    for batch in batches:
+        if use_lab_space:
+            batch = rgb_to_lab(batch)
+        if kmeans is None:
+            if len(batch) < k:
+                continue
+            if ensure_green:
+                init_centers = green_init_centers(batch, k, use_lab_space, seed=seed)
+            else:
+                init_centers = 'k-means++'
+            kmeans = MiniBatchKMeans(
+                n_clusters=k,
+                init=init_centers,
+                n_init=1,
+                batch_size=batch_size,
+                random_state=42
+            )
+        kmeans.partial_fit(batch)
+    if kmeans is None:
+        raise ValueError(f"Not enough pixels to fit {k} clusters")
+    return kmeans
+
+
+def iter_array_batches(data, batch_size=4096, tile_rows=64, epochs=2, seed=42):
+    """Yield an init batch, then random pixel batches from shuffled row tiles"""
+    rng = np.random.default_rng(seed)
+    h = data.shape[0]
+    flat_data = data.reshape((-1, 3))
+    # The first batch seeds the centers, so draw it from the whole image
+    # (3 x batch_size, like MiniBatchKMeans' default init_size)
+    yield flat_data[rng.integers(0, len(flat_data), min(3 * batch_size, len(flat_data)))]
+    starts = np.arange(0, h, tile_rows)
+    for _ in range(epochs):
+        for y0 in rng.permutation(starts):
+            tile = data[y0:y0 + tile_rows].reshape((-1, 3))
+            yield tile[uniform_indices(len(tile), min(batch_size, len(tile)), rng)]
+
+
+@timed('kmeans_minibatch_cpu')
+def kmeans_minibatch_cpu(data, k, ensure_green=False, use_lab_space=False, batch_size=4096, epochs=2, seed=42):
+    """Streaming alternative to kmeans_cpu, trades some inertia for speed.
+
+    Batches and green init are drawn from `seed`, so runs are reproducible.
+    """
+    original_shape = data.shape[:2]
+    batches = iter_array_batches(data, batch_size, epochs=epochs, seed=seed)
+    kmeans = kmeans_minibatch_fit(batches, k, ensure_green, use_lab_space, batch_size, seed)
+    labels = assign_labels(data.reshape((-1, 3)), lambda colors: kmeans_predict(kmeans, colors, use_lab_space), k)
+    centers = kmeans_centers(kmeans, use_lab_space)
+    print(f"🕜 Please wait... image separation proccessing to {k} layers (mini-batch)...")
+
+    return labels.reshape(original_shape), centers
+
+
+@timed('kmeans_cpu')
+def kmeans_cpu(data, k, max_iter=20, ensure_green=False, precision_mode=False, use_lab_space=False,
+               use_histogram=False, sample_size=None, sample_strategy='uniform', seed=42):
+    """Cluster image colors, returns (H, W) labels and uint8 RGB centers.
+
+    With use_histogram the model is fitted on the distinct colors weighted
+    by their pixel counts, and each distinct color is labelled only once;
+    precision_mode sampling is unnecessary in that case.
+
+    precision_mode fits on `sample_size` pixels (default a fifth of the
+    image) drawn by the seeded `sample_strategy` sampler (see
+    utils.sampling), then labels every pixel.
+
+    `data` can also be an ImageHandle: precision_mode then draws the same
+    fit sample from the file and labels the image band by band, so the
+    full (H, W, 3) array is never built. The other modes read the whole image.
+    """
+    if isinstance(data, ImageHandle):
+        if precision_mode and not use_histogram:
+            return _kmeans_cpu_lazy(data, k, max_iter, ensure_green, use_lab_space, sample_size,
+                                    sample_strategy, seed)
+        data = data.read()
+
+    original_shape = data.shape[:2]
+    flat_data = data.reshape((-1, 3))
+    
+    if use_histogram:
+        colors, counts, inverse = unique_colors(flat_data)
+        # KMeans needs at least k distinct points, otherwise fall back to pixels
+        if len(colors) >= k:
+            kmeans = kmeans_fit(colors, k, max_iter, ensure_green, use_lab_space, sample_weight=counts)
+            labels = kmeans.labels_.astype(label_dtype(k))[inverse]
+            centers = kmeans_centers(kmeans, use_lab_space)
+            print(f"🕜 Please wait... image separation proccessing to {k} layers ({len(colors)} unique colors)...")
+            return labels.reshape(original_shape), centers
     
     if precision_mode:
-        if use_lab_space:
-            full_data = rgb2lab(flat_data)
-        else:
-            full_data = flat_data
-        labels = kmeans.predict(full_data)
+        size = sample_size if sample_size is not None else len(flat_data) // 5
+        sampled_data = sample_pixels(flat_data, max(size, k), sample_strategy, seed, original_shape)
     else:
-        labels = kmeans.labels_
+        sampled_data = flat_data
     
-    centers = kmeans.cluster_centers_
-    if use_lab_space:
-        centers = lab2rgb(centers) * 255
+    kmeans = kmeans_fit(sampled_data, k, max_iter, ensure_green, use_lab_space,
+                        seed=seed if precision_mode else None)
+    
+    if precision_mode:
+        labels = assign_labels(flat_data, lambda colors: kmeans_predict(kmeans, colors, use_lab_space), k)
+    else:
+        labels = kmeans.labels_.astype(label_dtype(k))
     
-    centers = np.clip(centers, 0, 255).astype(np.uint8)
+    centers = kmeans_centers(kmeans, use_lab_space)
+    print(f"🕜 Please wait... image separation proccessing to {k} layers...")
+
+    return labels.reshape(original_shape), centers
+
+
+def grow_centers(points, weights, centers, k, rng):
+    """Extend fitted centers to k by D^2 sampling (the k-means++ rule) from weighted points"""
+    centers = list(centers)
+    d2 = ((points[:, None, :] - np.asarray(centers)[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+    while len(centers) < k:
+        p = weights * d2
+        new = points[rng.choice(len(points), p=p / p.sum())]
+        centers.append(new)
+        d2 = np.minimum(d2, ((points - new) ** 2).sum(axis=1))
+    return np.array(centers)
+
+
+def inertia_knee(ks, inertias):
+    """K at the knee of the inertia curve, or None when there is no bend.
+
+    Both axes are scaled to [0, 1] and the knee is the K lying furthest
+    below the straight line from the smallest to the largest K, the point
+    after which more colors stop paying off. Needs at least three Ks.
+    """
+    ks = np.asarray(ks, dtype=np.float64)
+    inertias = np.asarray(inertias, dtype=np.float64)
+    if len(ks) < 3 or inertias[0] <= inertias[-1]:
+        return None
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    y = (inertias - inertias[-1]) / (inertias[0] - inertias[-1])
+    gap = 1 - x - y
+    best = int(gap.argmax())
+    return int(ks[best]) if gap[best] > 0 else None
+
+
+@timed('kmeans_sweep')
+def kmeans_sweep(data, ks, max_iter=20, ensure_green=False, use_lab_space=False, sample_size=200_000, seed=42):
+    """Fit every cluster count in `ks` in one call, for choosing NUM_COLORS.
+
+    Pixels are collapsed to distinct colors (from a `sample_size` pixel
+    sample when there are more) and converted to Lab once. Only the
+    smallest K is seeded from scratch (k-means++ restarts, or green plus
+    D^2 sampling); each larger K starts from the previous centers plus
+    D^2-sampled new ones. Returns one dict per K, ascending, with labels,
+    uint8 centers and inertia; inertia_knee() suggests a K from them.
+    """
+    original_shape = data.shape[:2]
+    flat_data = data.reshape((-1, 3))
+    rng = np.random.default_rng(seed)
+
+    colors, counts, inverse = unique_colors(flat_data)
+    if len(colors) > sample_size:
+        sampled = flat_data[rng.choice(len(flat_data), sample_size, replace=False)]
+        colors, counts, _ = unique_colors(sampled)
+        inverse = None
+    points = rgb_to_lab(colors) if use_lab_space else colors.astype(np.float64)
+    # Inertia of the fit set scaled to the whole image
+    scale = len(flat_data) / counts.sum()
+
+    results = []
+    centers = None
+    for k in sorted(set(ks)):
+        if len(colors) < k:
+            raise ValueError(f"Only {len(colors)} distinct colors, cannot fit {k} clusters")
+        if centers is None and ensure_green:
+            green = green_init_centers(points, 1, use_lab_space)
+            init, n_init = grow_centers(points, counts, green, k, rng), 1
+        elif centers is None:
+            init, n_init = 'k-means++', 5
+        else:
+            init, n_init = grow_centers(points, counts, centers, k, rng), 1
+        kmeans = _new_kmeans(k, init, n_init, max_iter).fit(points, sample_weight=counts)
+        centers = kmeans.cluster_centers_
+
+        if inverse is not None:
+            labels = kmeans.labels_.astype(label_dtype(k))[inverse]
+        else:
+            labels = assign_labels(flat_data, lambda c: kmeans_predict(kmeans, c, use_lab_space), k)
+        inertia = float(kmeans.inertia_ * scale)
+        results.append({
+            'k': k,
+            'labels': labels.reshape(original_shape),
+            'centers': kmeans_centers(kmeans, use_lab_space),
+            'inertia': inertia,
+            'iterations': int(kmeans.n_iter_),
+        })
+        print(f"🕜 K={k}: inertia {inertia:.4g}, {kmeans.n_iter_} iterations")
+
+    return results
+
+
+def _kmeans_cpu_lazy(handle, k, max_iter, ensure_green, use_lab_space, sample_size=None, sample_strategy='uniform',
+                     seed=42, band_rows=512):
+    h, w = handle.shape[:2]
+    size = sample_size if sample_size is not None else (h * w) // 5
+    sampled_data = handle.sample_pixels(max(size, k), band_rows, seed, sample_strategy)
+    kmeans = kmeans_fit(sampled_data, k, max_iter, ensure_green, use_lab_space, seed=seed)
+
+    assign = LabelCache(lambda colors: kmeans_predict(kmeans, colors, use_lab_space), k)
+    labels = np.empty((h, w), dtype=label_dtype(k))
+    for y0, y1, band, _ in handle.iter_row_bands(band_rows):
+        labels[y0:y1] = assign(band.reshape((-1, 3))).reshape((y1 - y0, w))
+
+    centers = kmeans_centers(kmeans, use_lab_space)
     print(f"🕜 Please wait... image separation proccessing to {k} layers...")
 
-    return labels.reshape(original_shape), centers
\ No newline at end of file
+    return labels, centers
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import numpy as np
+from skimage.color import rgb2lab
+
+from utils.color_histogram import pack_rgb, unpack_rgb
+from utils.metrics import timed
+
+LUT_PATH = os.environ.get(
+    'COLOR_SEPARATION_LAB_LUT',
+    os.path.join(os.path.expanduser('~'), '.cache', 'color-separation', 'rgb2lab_float32.npy')
+)
+# Below this many pixels a direct rgb2lab call is cheaper than touching the table
+LUT_MIN_PIXELS = 1 << 16
+BUILD_CHUNK = 1 << 20
+
+_lut = None
+_lut_path = None
+
+
+def build_lab_lut(path):
+    """Write the full 2^24 x 3 float32 RGB->Lab table to `path` as .npy"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # A unique temp file, so threads building at once do not share one
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        table = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(1 << 24, 3))
+        for start in range(0, 1 << 24, BUILD_CHUNK):
+            keys = np.arange(start, start + BUILD_CHUNK, dtype=np.uint32)
+            table[start:start + BUILD_CHUNK] = rgb2lab(unpack_rgb(keys))
+        table.flush()
+        del table
+        # Atomic rename so concurrent builders never map a half-written table
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_lab_lut(path=None):
+    """Memory-map the table, building it on first use; shared via the page cache"""
+    global _lut, _lut_path
+    path = path or LUT_PATH
+    if _lut is None or _lut_path != path:
+        if not os.path.exists(path):
+            print("🧮 Building RGB->Lab lookup table (one-time)...")
+            build_lab_lut(path)
+        _lut = np.load(path, mmap_mode='r')
+        _lut_path = path
+    return _lut
+
+
+@timed('lab_conversion')
+def rgb_to_lab(flat_data):
+    """Convert (N, 3) RGB pixels to Lab, via the lookup table for large uint8 input"""
+    if flat_data.dtype != np.uint8 or len(flat_data) < LUT_MIN_PIXELS:
+        return rgb2lab(flat_data)
+    return load_lab_lut()[pack_rgb(flat_data)]
@@ -1,59 +1,295 @@
 import numpy as np
-from PIL import Image, ImageFilter
+from PIL import Image
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+import contextlib
+import json
 import os
 
+from utils.metrics import stage, timed
+from utils.png_writer import PngStreamWriter
+from utils.smoothing import blur_halo, iter_smooth_layers
+
 def rgb_to_hex(rgb):
     return '{:02x}{:02x}{:02x}'.format(*rgb)
 
-def export_layers(labels, centers, out_dir, original_metadata, dot_size=1):
+def dilate_mask(mask, dot_size):
+    """Grow every set pixel into a dot_size x dot_size square towards bottom-right"""
+    if dot_size <= 1:
+        return mask
+    h, w = mask.shape
+    rows = mask.copy()
+    for dx in range(1, min(dot_size, w)):
+        rows[:, dx:] |= mask[:, :w - dx]
+    out = rows.copy()
+    for dy in range(1, min(dot_size, h)):
+        out[dy:, :] |= rows[:h - dy, :]
+    return out
+
+def build_label_index(labels, k):
+    """Group pixel indices by label with a single sort of the label map.
+
+    Returns (order, offsets): the flat pixel indices of label i are
+    order[offsets[i]:offsets[i+1]], and np.diff(offsets) is the histogram.
+    """
+    flat = labels.ravel()
+    counts = np.bincount(flat, minlength=k)[:k]
+    # Stable sort of an 8/16-bit key is a radix sort, so this stays O(N + K)
+    key = flat.astype(np.uint8 if k <= 256 else np.uint16, copy=False)
+    order = np.argsort(key, kind='stable')
+    if len(order) <= np.iinfo(np.uint32).max:
+        # Halve the index kept alive for the whole export
+        order = order.astype(np.uint32)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    return order, offsets
+
+@timed('mask_building')
+def render_layer(indices, shape, color, dot_size=1, out=None, mask=None):
+    """Build a RGBA layer array from flat pixel indices in one vectorized pass.
+
+    `out` ((H, W, 4) uint8) and `mask` ((H*W,) bool) are optional buffers
+    that are cleared and reused instead of allocating new ones per layer.
+    """
+    h, w = shape
+    if out is None:
+        layer = np.zeros((h, w, 4), dtype=np.uint8)
+    else:
+        layer = out
+        layer.fill(0)
+    if dot_size <= 1:
+        layer.reshape(-1, 4)[indices] = (*color, 255)
+        return layer
+    if mask is None:
+        mask = np.zeros(h * w, dtype=bool)
+    else:
+        mask.fill(False)
+    mask[indices] = True
+    layer[dilate_mask(mask.reshape(h, w), dot_size)] = (*color, 255)
+    return layer
+
+def layer_bbox(indices, shape, dot_size=1):
+    """(x, y, width, height) covered by a layer's pixels, dots included.
+
+    `indices` must be ascending, as returned by build_label_index.
+    """
+    h, w = shape
+    cols = indices % w
+    x0, y0 = int(cols.min()), int(indices[0] // w)
+    x1 = min(w, int(cols.max()) + max(1, dot_size))
+    y1 = min(h, int(indices[-1] // w) + max(1, dot_size))
+    return x0, y0, x1 - x0, y1 - y0
+
+def _write_layer(indices, shape, color, dot_size, path, original_metadata, buffers, crop=False):
+    """Render and save one layer, returns its (x, y, width, height) on the canvas"""
+    h, w = shape
+    bbox = (0, 0, w, h)
+    if crop:
+        bbox = layer_bbox(indices, shape, dot_size)
+        x, y, w, h = bbox
+        indices = (indices // shape[1] - y) * w + (indices % shape[1] - x)
+    flat_out, flat_mask = buffers.get()
+    try:
+        out = flat_out[:h * w * 4].reshape((h, w, 4))
+        mask = None if flat_mask is None else flat_mask[:h * w]
+        _save_layer(render_layer(indices, (h, w), color, dot_size, out, mask), path, original_metadata)
+    finally:
+        buffers.put((flat_out, flat_mask))
+    return bbox
+
+def _save_layer(layer, path, original_metadata):
+    img = Image.fromarray(layer, 'RGBA')
+    
+    if 'dpi' in original_metadata:
+        img.info['dpi'] = original_metadata['dpi']
+    
+    save_kwargs = {
+        'format': 'PNG',
+        'compress_level': 6,
+        'dpi': original_metadata.get('dpi', (72, 72))
+    }
+    with stage('png_encoding') as record:
+        img.save(path, **save_kwargs)
+        record['bytes_written'] = os.path.getsize(path)
+
+@timed('export_layers')
+def export_layers(labels, centers, out_dir, original_metadata, dot_size=1, workers=1, crop=False):
+    """Render and save one RGBA PNG per center.
+
+    Up to `workers` layers are rendered and encoded concurrently (Pillow
+    releases the GIL while compressing), so at most that many layer buffers
+    are alive at once. Messages are printed in layer order regardless.
+
+    With `crop`, each PNG only covers its layer's bounding box and the
+    offsets are written to layers.json next to the layers.
+    """
     os.makedirs(out_dir, exist_ok=True)
     h, w = labels.shape
+    order, offsets = build_label_index(labels, len(centers))
+    workers = max(1, workers)
+    pending = deque()
+    placements = []
+    # One reusable layer (and dilation mask) buffer per worker
+    buffers = Queue()
+    for _ in range(workers):
+        buffers.put((np.empty(h * w * 4, dtype=np.uint8), np.empty(h * w, dtype=bool) if dot_size > 1 else None))
     
-    for i, color in enumerate(centers):
-        mask = (labels == i).astype(np.uint8) * 255
-        hex_color = rgb_to_hex(color)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, color in enumerate(centers):
+            indices = order[offsets[i]:offsets[i+1]]
+            hex_color = rgb_to_hex(color)
 
-        if mask.sum() == 0:
-            print(f"Skipping layer {i+1} - {hex_color} (empty mask)")
-            continue
-        
-        img = Image.new('RGBA', (w, h), (0, 0, 0, 0))
-        pixels = img.load()
+            if len(indices) == 0:
+                pending.append((None, f"Skipping layer {i+1} - {hex_color} (empty mask)"))
+            else:
+                filename = f"layer_{i+1}_{hex_color}.png"
+                future = pool.submit(_write_layer, indices, labels.shape, color, dot_size,
+                                     f"{out_dir}/{filename}", original_metadata, buffers, crop)
+                pending.append((future, f"{i+1} - {filename} -> complete ✅", filename, hex_color))
+            
+            while len(pending) > workers:
+                _report(pending.popleft(), placements)
         
-        if 'dpi' in original_metadata:
-            img.info['dpi'] = original_metadata['dpi']
-        
-        y_indices, x_indices = np.where(mask > 0)
-        for y, x in zip(y_indices, x_indices):
-            for dy in range(dot_size):
-                for dx in range(dot_size):
-                    if x+dx < w and y+dy < h:
-                        pixels[x+dx, y+dy] = (*color, 255)
-        
-        save_kwargs = {
-            'format': 'PNG',
-            'compress_level': 6,
-            'dpi': original_metadata.get('dpi', (72, 72))
-        }
-        print(f"{i+1} - layer_{i+1}_{hex_color}.png -> complete ✅")
-        
-        img.save(f"{out_dir}/layer_{i+1}_{hex_color}.png", **save_kwargs)
+        while pending:
+            _report(pending.popleft(), placements)
+
+    if crop:
+        _write_json(os.path.join(out_dir, 'layers.json'), {
+            'width': w,
+            'height': h,
+            'dpi': [float(d) for d in original_metadata.get('dpi', (72, 72))],
+            'layers': placements
+        })
 
     print(f"✅ Proccess complete. Result saved in /{out_dir} directory")
 
-def export_smooth_layers(labels, centers, probs, out_dir, blur_radius, original_metadata):
+def _report(entry, placements):
+    future, message = entry[:2]
+    if future is not None:
+        x, y, width, height = future.result()
+        placements.append({'file': entry[2], 'hex': '#' + entry[3],
+                           'x': x, 'y': y, 'width': width, 'height': height})
+    print(message)
+
+def _write_json(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+@timed('export_smooth_layers')
+def export_smooth_layers(labels, centers, probs, out_dir, blur_radius, original_metadata, mode="probability"):
+    """Save a blurred soft mask and a hard mask per center.
+
+    `probs` is either the (N, K) responsibilities from gmm_cpu or the
+    (K, H, W) uint8 soft-mask stack from gmm_soft_cpu. See
+    iter_smooth_layers for the smoothing modes.
+    """
     os.makedirs(out_dir, exist_ok=True)
     h, w = labels.shape
-    
+    order, offsets = build_label_index(labels, len(centers))
+
+    if probs.dtype == np.uint8:
+        stack = probs
+    else:
+        stack = np.empty((len(centers), h, w), dtype=np.uint8)
+        for i in range(len(centers)):
+            stack[i] = (probs[:, i].reshape((h, w)) * 255).astype(np.uint8)
+
+    for i, mask_soft, mask_hard in iter_smooth_layers(order, offsets, (h, w), stack, blur_radius, mode):
+        hex_color = '#{:02x}{:02x}{:02x}'.format(*centers[i])
+        with stage('png_encoding') as record:
+            Image.fromarray(mask_soft).save(f"{out_dir}/layer_{i}_{hex_color}_soft.png")
+            Image.fromarray(mask_hard).save(f"{out_dir}/layer_{i}_{hex_color}_hard.png")
+            record['bytes_written'] = (os.path.getsize(f"{out_dir}/layer_{i}_{hex_color}_soft.png")
+                                       + os.path.getsize(f"{out_dir}/layer_{i}_{hex_color}_hard.png"))
+
+@contextlib.contextmanager
+def _png_writers(specs, width, height, dpi=None):
+    """Open a PngStreamWriter per (path, mode) in specs.
+
+    If the body raises, every writer is aborted and its partial file
+    removed, and the original error propagates.
+    """
+    writers = []
+    try:
+        # The stack hands the exception to each writer's __exit__, which aborts
+        with contextlib.ExitStack() as stack:
+            for path, mode in specs:
+                writers.append(stack.enter_context(PngStreamWriter(path, width, height, mode, dpi=dpi)))
+            yield writers
+    except BaseException:
+        for writer in writers:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(writer.path)
+        raise
+
+def _close_writers(writers):
+    """Finish every PNG stream, recording the encoder flush and output size"""
+    with stage('png_encoding') as record:
+        for writer in writers:
+            writer.close()
+        record['bytes_written'] = sum(os.path.getsize(writer.path) for writer in writers)
+
+@timed('export_layers')
+def export_layers_tiled(bands, centers, out_dir, shape, original_metadata, dot_size=1):
+    """Streaming variant of export_layers.
+
+    `bands` yields (y0, labels_band) in row order; every layer PNG is written
+    incrementally so memory is bounded by the band size, not the image size.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    h, w = shape
+    k = len(centers)
+    dpi = original_metadata.get('dpi', (72, 72))
+    paths = [f"{out_dir}/layer_{i+1}_{rgb_to_hex(color)}.png" for i, color in enumerate(centers)]
+    counts = np.zeros(k, dtype=np.int64)
+    carry = np.zeros((0, w), dtype=np.int64)
+
+    with _png_writers([(path, 'RGBA') for path in paths], w, h, dpi) as writers:
+        for _, labels_band in bands:
+            counts += np.bincount(labels_band.ravel(), minlength=k)[:k]
+            # dot_size grows pixels downwards, so the previous band's last rows bleed in
+            ext = np.concatenate((carry.astype(labels_band.dtype), labels_band)) if len(carry) else labels_band
+            order, offsets = build_label_index(ext, k)
+            for i, color in enumerate(centers):
+                layer = render_layer(order[offsets[i]:offsets[i+1]], ext.shape, color, dot_size)
+                with stage('png_encoding'):
+                    writers[i].write_rows(layer[len(carry):])
+            carry = ext[max(0, len(ext) - (dot_size - 1)):] if dot_size > 1 else carry
+        _close_writers(writers)
+
     for i, color in enumerate(centers):
-        mask_hard = (labels == i).astype(np.uint8) * 255
-        
-        mask_soft = (probs[:, i].reshape((h, w)) * 255).astype(np.uint8)
-        
-        img_soft = Image.fromarray(mask_soft)
-        img_soft = img_soft.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-        
-        hex_color = '#{:02x}{:02x}{:02x}'.format(*color)
-        img_soft.save(f"{out_dir}/layer_{i}_{hex_color}_soft.png")
-        
-        Image.fromarray(mask_hard).save(f"{out_dir}/layer_{i}_{hex_color}_hard.png")
\ No newline at end of file
+        hex_color = rgb_to_hex(color)
+        if counts[i] == 0:
+            os.remove(paths[i])
+            print(f"Skipping layer {i+1} - {hex_color} (empty mask)")
+        else:
+            print(f"{i+1} - layer_{i+1}_{hex_color}.png -> complete ✅")
+
+    print(f"✅ Proccess complete. Result saved in /{out_dir} directory")
+
+@timed('export_smooth_layers')
+def export_smooth_layers_tiled(bands, centers, out_dir, shape, blur_radius, mode="probability"):
+    """Streaming variant of export_smooth_layers.
+
+    `bands` yields (labels_ext, soft_ext, pad_top, rows): the (rows', W)
+    label map and (K, rows', W) uint8 soft-mask stack of a band plus
+    blur_halo(blur_radius) rows of context on each side (clipped at the
+    image edges), where the band itself starts pad_top rows in and is
+    `rows` rows tall.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    h, w = shape
+    k = len(centers)
+    names = [f"{out_dir}/layer_{i}_#{rgb_to_hex(color)}" for i, color in enumerate(centers)]
+    specs = [(f"{name}_{kind}.png", 'L') for kind in ('soft', 'hard') for name in names]
+
+    with _png_writers(specs, w, h) as writers:
+        soft_writers, hard_writers = writers[:k], writers[k:]
+        for labels_ext, soft_ext, pad_top, rows in bands:
+            order, offsets = build_label_index(labels_ext, k)
+            layers = iter_smooth_layers(order, offsets, labels_ext.shape, soft_ext, blur_radius, mode, report=False)
+            for i, mask_soft, mask_hard in layers:
+                with stage('png_encoding'):
+                    soft_writers[i].write_rows(mask_soft[pad_top:pad_top + rows])
+                    hard_writers[i].write_rows(mask_hard[pad_top:pad_top + rows])
+        _close_writers(writers)
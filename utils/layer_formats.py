@@ -0,0 +1,96 @@
+"""Compact alternatives to one full-size RGBA PNG per layer.
+
+- indexed: a single palettized (mode "P") PNG of the label map plus a
+  palette.json sidecar mapping palette index to layer color.
+- tiff: one multi-page TIFF with a 1-bit CCITT G4 page per layer, written
+  page by page, plus the same palette.json sidecar.
+"""
+import json
+import os
+
+import numpy as np
+from PIL import Image, TiffImagePlugin
+
+from utils.layer_exporter import build_label_index, dilate_mask, rgb_to_hex
+from utils.metrics import stage, timed
+
+
+def write_palette_sidecar(path, centers, counts, original_metadata, shape, **extra):
+    """Write the palette index -> color mapping shared by the compact formats"""
+    h, w = shape
+    data = {
+        'width': w,
+        'height': h,
+        'dpi': [float(d) for d in original_metadata.get('dpi', (72, 72))],
+        'colors': [
+            {'index': i, 'hex': '#' + rgb_to_hex(color), 'rgb': [int(c) for c in color], 'pixels': int(count)}
+            for i, (color, count) in enumerate(zip(centers, counts))
+        ]
+    }
+    data.update(extra)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+@timed('export_layers')
+def export_indexed_png(labels, centers, out_dir, original_metadata):
+    """Save the label map as one palettized PNG, palette entry i = center i.
+
+    Every pixel belongs to exactly one layer, so dot_size is not applied
+    here: dots overlap and cannot be stored in a single index per pixel.
+    """
+    if len(centers) > 256:
+        raise ValueError("Indexed PNG supports at most 256 colors, got " + str(len(centers)))
+    os.makedirs(out_dir, exist_ok=True)
+    h, w = labels.shape
+
+    img = Image.fromarray(labels.astype(np.uint8, copy=False))
+    img.putpalette(np.asarray(centers, dtype=np.uint8).ravel().tolist())
+    path = os.path.join(out_dir, 'separation_indexed.png')
+    with stage('png_encoding') as record:
+        img.save(path, format='PNG', compress_level=6, dpi=original_metadata.get('dpi', (72, 72)))
+        record['bytes_written'] = os.path.getsize(path)
+
+    counts = np.bincount(labels.ravel(), minlength=len(centers))[:len(centers)]
+    write_palette_sidecar(os.path.join(out_dir, 'palette.json'), centers, counts,
+                          original_metadata, (h, w), image='separation_indexed.png')
+    print(f"✅ Proccess complete. Indexed PNG saved in /{out_dir} directory")
+    return path
+
+
+@timed('export_layers')
+def export_layers_tiff(labels, centers, out_dir, original_metadata, dot_size=1):
+    """Save one 1-bit page per non-empty layer into layers.tif.
+
+    Pages are appended one at a time, so only a single layer mask is held
+    in memory. palette.json lists which layer each page holds.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    h, w = labels.shape
+    order, offsets = build_label_index(labels, len(centers))
+    dpi = original_metadata.get('dpi', (72, 72))
+    mask = np.empty(h * w, dtype=bool)
+    pages = []
+
+    path = os.path.join(out_dir, 'layers.tif')
+    with stage('tiff_encoding') as record:
+        with TiffImagePlugin.AppendingTiffWriter(path, new=True) as tiff:
+            for i, color in enumerate(centers):
+                indices = order[offsets[i]:offsets[i+1]]
+                if len(indices) == 0:
+                    print(f"Skipping layer {i+1} - {rgb_to_hex(color)} (empty mask)")
+                    continue
+                mask.fill(False)
+                mask[indices] = True
+                page = Image.fromarray(dilate_mask(mask.reshape((h, w)), dot_size))
+                page.save(tiff, format='TIFF', compression='group4', dpi=dpi)
+                tiff.newFrame()
+                pages.append(i)
+                print(f"{i+1} - page {len(pages)} #{rgb_to_hex(color)} -> complete ✅")
+        record['bytes_written'] = os.path.getsize(path)
+
+    counts = np.diff(offsets)
+    write_palette_sidecar(os.path.join(out_dir, 'palette.json'), centers, counts,
+                          original_metadata, (h, w), image='layers.tif', pages=pages)
+    print(f"✅ Proccess complete. Result saved in /{out_dir} directory")
+    return path
@@ -0,0 +1,129 @@
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# None while disabled, so every hook is a single attribute check
+_records = None
+_NULL_RECORD = {}
+
+
+def peak_rss_mb():
+    """Process high-water mark RSS in MB, or None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KB on Linux and bytes on macOS
+    return round(peak / (1024 ** 2 if os.uname().sysname == 'Darwin' else 1024), 1)
+
+
+class Stage:
+    """Context manager that records wall time and peak RSS for one stage.
+
+    The yielded dict can carry extra fields such as bytes_written.
+    """
+    __slots__ = ('name', 'record', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.record = None
+
+    def __enter__(self):
+        if _records is None:
+            return _NULL_RECORD
+        self.record = {'stage': self.name}
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.record is not None:
+            self.record['seconds'] = time.perf_counter() - self.start
+            self.record['peak_rss_mb'] = peak_rss_mb()
+            _records.append(self.record)
+        return False
+
+
+def stage(name):
+    return Stage(name)
+
+
+def timed(name):
+    """Decorator form of stage() for whole functions"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _records is None:
+                return fn(*args, **kwargs)
+            with Stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable():
+    global _records
+    _records = []
+
+
+def disable():
+    global _records
+    records, _records = _records, None
+    return records or []
+
+
+def summarize(records):
+    """Aggregate records per stage name, in first-seen order"""
+    summary = {}
+    for record in records:
+        entry = summary.setdefault(record['stage'], {'calls': 0, 'seconds': 0.0, 'bytes_written': 0, 'peak_rss_mb': None})
+        entry['calls'] += 1
+        entry['seconds'] += record['seconds']
+        entry['bytes_written'] += record.get('bytes_written', 0)
+        if record['peak_rss_mb'] is not None:
+            entry['peak_rss_mb'] = max(entry['peak_rss_mb'] or 0, record['peak_rss_mb'])
+    for entry in summary.values():
+        entry['seconds'] = round(entry['seconds'], 4)
+    return summary
+
+
+@contextlib.contextmanager
+def session(report_path=None, profile_path=None):
+    """Record stages for one run and write them as JSON to report_path.
+
+    With profile_path the run also executes under cProfile and the stats
+    are dumped there (open with snakeviz or pstats). Stage names are plain
+    function-level boundaries, so py-spy flame graphs line up with them.
+    Does nothing when both paths are None.
+    """
+    if report_path is None and profile_path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile() if profile_path else None
+    enable()
+    start = time.perf_counter()
+    try:
+        if profiler:
+            profiler.enable()
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        records = disable()
+        if report_path:
+            report = {
+                'total_seconds': round(time.perf_counter() - start, 4),
+                'peak_rss_mb': peak_rss_mb(),
+                'summary': summarize(records),
+                'stages': records,
+            }
+            with open(report_path, 'w') as f:
+                json.dump(report, f, indent=2)
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+import numpy as np
+
+from utils.image_loader import ImageHandle
+
+CACHE_SUFFIX = '.npz'
+
+
+def cache_key(array, params, band_rows=512):
+    """Content hash of the pixel data plus the clustering parameters.
+
+    `array` can also be an ImageHandle, hashed one row band at a time to
+    the same key as its decoded array.
+    """
+    handle = isinstance(array, ImageHandle)
+    dtype = 'uint8' if handle else str(array.dtype)
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'shape': array.shape, 'dtype': dtype, 'params': params},
+                             sort_keys=True, default=str).encode())
+    if handle:
+        for _, _, band, _ in array.iter_row_bands(band_rows):
+            digest.update(np.ascontiguousarray(band).data)
+    else:
+        digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()
+
+
+def load_cached(cache_dir, key):
+    """Return (labels, centers, soft_masks or None) for `key`, or None on a miss"""
+    path = os.path.join(cache_dir, key + CACHE_SUFFIX)
+    try:
+        with np.load(path) as entry:
+            result = entry['labels'], entry['centers'], entry['soft_masks'] if 'soft_masks' in entry else None
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        # A truncated or corrupt entry is a miss; drop it so it is rewritten
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    # Bump mtime so eviction is least-recently-used, not least-recently-written.
+    # Another process may have evicted the entry since; the data is already read.
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return result
+
+
+def store_cached(cache_dir, key, labels, centers, soft_masks=None, max_bytes=None):
+    """Write a compressed entry atomically, then evict LRU entries above max_bytes"""
+    os.makedirs(cache_dir, exist_ok=True)
+    arrays = {
+        'labels': labels.astype(np.uint8 if len(centers) <= 256 else np.uint16),
+        'centers': centers,
+    }
+    if soft_masks is not None:
+        arrays['soft_masks'] = soft_masks
+    # A unique temp file per call: service threads may store the same key at once
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, os.path.join(cache_dir, key + CACHE_SUFFIX))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    if max_bytes is not None:
+        evict(cache_dir, max_bytes)
+
+
+def evict(cache_dir, max_bytes):
+    """Delete least-recently-used entries until the cache fits in max_bytes"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_SUFFIX):
+            try:
+                stat = os.stat(os.path.join(cache_dir, name))
+            except FileNotFoundError:
+                continue  # evicted by another process after listdir
+            entries.append((stat.st_mtime, stat.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
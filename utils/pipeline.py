@@ -0,0 +1,229 @@
+import json
+import os
+from types import SimpleNamespace
+
+from utils.image_loader import load_image, open_image
+from utils.kmeans_cpu import kmeans_cpu, kmeans_minibatch_cpu, kmeans_sweep, inertia_knee
+from utils.despeckle import despeckle
+from utils.gmm_cpu import gmm_soft_cpu, gmm_labels_cpu
+from utils.layer_exporter import export_layers, export_smooth_layers
+from utils.layer_formats import export_indexed_png, export_layers_tiff
+from utils.palette_cache import cache_key, load_cached, store_cached
+from utils.tiled_pipeline import separate_tiled
+
+
+def load_settings(**overrides):
+    """Snapshot of the UPPER_CASE fields of config.py, with overrides applied"""
+    import config
+
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    unknown = set(overrides) - set(settings)
+    if unknown:
+        raise ValueError("Unknown settings: " + ", ".join(sorted(unknown)))
+    settings.update(overrides)
+    return SimpleNamespace(**settings)
+
+
+def cluster_image(image_data, settings):
+    """Run the configured clustering, returns (labels, centers, soft_masks or None).
+
+    image_data['array'] is an ImageHandle when streams_input(settings).
+    """
+    data = image_data['array']
+
+    if settings.CLUSTER_ALGORITHM == "kmeans":
+        labels, centers = kmeans_cpu(
+            data,
+            settings.NUM_COLORS,
+            ensure_green=settings.FORCE_GREEN_COLOR,
+            precision_mode=settings.KMEANS_PRECISION_MODE,
+            use_lab_space=settings.USE_LAB_COLORSPACE,
+            use_histogram=settings.FIT_ON_UNIQUE_COLORS,
+            sample_size=settings.FIT_SAMPLE_SIZE,
+            sample_strategy=settings.SAMPLE_STRATEGY,
+            seed=settings.SAMPLE_SEED
+        )
+        return labels, centers, None
+    elif settings.CLUSTER_ALGORITHM == "minibatch":
+        labels, centers = kmeans_minibatch_cpu(
+            data,
+            settings.NUM_COLORS,
+            ensure_green=settings.FORCE_GREEN_COLOR,
+            use_lab_space=settings.USE_LAB_COLORSPACE,
+            batch_size=settings.MINIBATCH_SIZE,
+            seed=settings.SAMPLE_SEED
+        )
+        return labels, centers, None
+    elif settings.CLUSTER_ALGORITHM == "gmm":
+        if settings.GMM_EXPORT_SMOOTH:
+            return gmm_soft_cpu(
+                data,
+                settings.NUM_COLORS,
+                settings.GMM_COVARIANCE_TYPE,
+                use_histogram=settings.FIT_ON_UNIQUE_COLORS
+            )
+        labels, centers = gmm_labels_cpu(
+            data,
+            settings.NUM_COLORS,
+            settings.GMM_COVARIANCE_TYPE,
+            use_histogram=settings.FIT_ON_UNIQUE_COLORS
+        )
+        return labels, centers, None
+    else:
+        raise ValueError("Unsupported clustering algorithm: " + settings.CLUSTER_ALGORITHM)
+
+
+def clustering_params(settings):
+    """Settings that change the clustering result, used as the cache key"""
+    sampled = settings.CLUSTER_ALGORITHM == "kmeans" and settings.KMEANS_PRECISION_MODE
+    return {
+        'algorithm': settings.CLUSTER_ALGORITHM,
+        'k': settings.NUM_COLORS,
+        'lab': settings.USE_LAB_COLORSPACE,
+        'ensure_green': settings.FORCE_GREEN_COLOR,
+        'precision_mode': settings.KMEANS_PRECISION_MODE,
+        'covariance_type': settings.GMM_COVARIANCE_TYPE,
+        'unique_colors': settings.FIT_ON_UNIQUE_COLORS,
+        'minibatch_size': settings.MINIBATCH_SIZE,
+        'soft_masks': settings.CLUSTER_ALGORITHM == "gmm" and settings.GMM_EXPORT_SMOOTH,
+        # Only precision-mode KMeans draws a fit sample
+        'sample': [settings.FIT_SAMPLE_SIZE, settings.SAMPLE_STRATEGY, settings.SAMPLE_SEED] if sampled else None,
+        # Mini-batch draws its batches from the seed alone
+        'minibatch_seed': settings.SAMPLE_SEED if settings.CLUSTER_ALGORITHM == "minibatch" else None,
+    }
+
+
+def cluster_image_cached(image_data, settings):
+    """cluster_image behind the on-disk palette cache (PALETTE_CACHE_DIR)"""
+    if not settings.PALETTE_CACHE_DIR:
+        return cluster_image(image_data, settings)
+
+    key = cache_key(image_data['array'], clustering_params(settings))
+    cached = load_cached(settings.PALETTE_CACHE_DIR, key)
+    if cached is not None:
+        print(f"💾 Palette cache hit ({key[:12]}), skipping clustering")
+        return cached
+
+    print(f"💾 Palette cache miss ({key[:12]})")
+    labels, centers, soft_masks = cluster_image(image_data, settings)
+    store_cached(settings.PALETTE_CACHE_DIR, key, labels, centers, soft_masks,
+                 max_bytes=settings.PALETTE_CACHE_MAX_BYTES)
+    return labels, centers, soft_masks
+
+
+def export_image(labels, centers, soft_masks, image_data, output_dir, smooth_dir, settings):
+    """Write the layers for a clustering result"""
+    if settings.DESPECKLE:
+        labels = despeckle(labels, settings.DESPECKLE_MODE_SIZE, settings.DESPECKLE_MIN_AREA,
+                           band_rows=settings.TILE_ROWS)
+    if soft_masks is not None:
+        export_smooth_layers(
+            labels, centers, soft_masks,
+            smooth_dir,
+            settings.GMM_BLUR_RADIUS,
+            original_metadata=image_data,
+            mode=settings.GMM_SMOOTH_MODE
+        )
+    elif settings.EXPORT_FORMAT == "indexed":
+        export_indexed_png(labels, centers, output_dir, original_metadata=image_data)
+    elif settings.EXPORT_FORMAT == "tiff":
+        export_layers_tiff(labels, centers, output_dir, original_metadata=image_data, dot_size=settings.DOT_SIZE)
+    elif settings.EXPORT_FORMAT == "png":
+        export_layers(
+            labels,
+            centers,
+            output_dir,
+            original_metadata=image_data,
+            dot_size=settings.DOT_SIZE,
+            workers=settings.EXPORT_WORKERS,
+            crop=settings.EXPORT_CROP
+        )
+    else:
+        raise ValueError("Unsupported export format: " + settings.EXPORT_FORMAT)
+
+
+def separate_image(path, output_dir, smooth_dir, settings):
+    """Full separation of one image file, returns the uint8 RGB centers"""
+    if settings.TILED_MODE:
+        return separate_tiled(
+            path,
+            settings.NUM_COLORS,
+            output_dir,
+            algorithm=settings.CLUSTER_ALGORITHM,
+            tile_rows=settings.TILE_ROWS,
+            sample_size=settings.FIT_SAMPLE_SIZE,
+            dot_size=settings.DOT_SIZE,
+            ensure_green=settings.FORCE_GREEN_COLOR,
+            use_lab_space=settings.USE_LAB_COLORSPACE,
+            covariance_type=settings.GMM_COVARIANCE_TYPE,
+            export_smooth=settings.GMM_EXPORT_SMOOTH,
+            smooth_dir=smooth_dir,
+            blur_radius=settings.GMM_BLUR_RADIUS,
+            smooth_mode=settings.GMM_SMOOTH_MODE,
+            minibatch_size=settings.MINIBATCH_SIZE,
+            sample_strategy=settings.SAMPLE_STRATEGY,
+            seed=settings.SAMPLE_SEED
+        )
+
+    if streams_input(settings):
+        with open_image(path) as handle:
+            image_data = {'array': handle, 'dpi': handle.dpi, 'mode': handle.mode, 'format': handle.format}
+            labels, centers, soft_masks = cluster_image_cached(image_data, settings)
+    else:
+        image_data = load_image(path)
+        labels, centers, soft_masks = cluster_image_cached(image_data, settings)
+    export_image(labels, centers, soft_masks, image_data, output_dir, smooth_dir, settings)
+    return centers
+
+
+def streams_input(settings):
+    """True when clustering reads the image through a lazy ImageHandle.
+
+    Precision-mode KMeans only needs a fit sample and row bands to label,
+    so the full (H, W, 3) array is never built for it.
+    """
+    return (settings.CLUSTER_ALGORITHM == "kmeans" and settings.KMEANS_PRECISION_MODE
+            and not settings.FIT_ON_UNIQUE_COLORS)
+
+
+def sweep_image(path, output_dir, smooth_dir, settings):
+    """Fit every K in NUM_COLORS_SWEEP at once and export each into output_dir/k<K>.
+
+    Writes output_dir/sweep.json with the palette and inertia per K, the
+    K at the knee of the inertia curve flagged, and returns the sweep results.
+    """
+    if settings.CLUSTER_ALGORITHM != "kmeans":
+        raise ValueError("NUM_COLORS_SWEEP supports only CLUSTER_ALGORITHM = \"kmeans\"")
+
+    os.makedirs(output_dir, exist_ok=True)
+    image_data = load_image(path)
+    results = kmeans_sweep(
+        image_data['array'],
+        settings.NUM_COLORS_SWEEP,
+        ensure_green=settings.FORCE_GREEN_COLOR,
+        use_lab_space=settings.USE_LAB_COLORSPACE,
+        sample_size=settings.FIT_SAMPLE_SIZE,
+        seed=settings.SAMPLE_SEED
+    )
+    for result in results:
+        k = result['k']
+        export_image(result['labels'], result['centers'], None, image_data,
+                     os.path.join(output_dir, f"k{k}"), os.path.join(smooth_dir, f"k{k}"), settings)
+
+    knee = inertia_knee([r['k'] for r in results], [r['inertia'] for r in results])
+    summary = [
+        {
+            'k': r['k'],
+            'inertia': r['inertia'],
+            'knee': r['k'] == knee,
+            'centers': ['{:02x}{:02x}{:02x}'.format(*c) for c in r['centers']],
+        }
+        for r in results
+    ]
+    with open(os.path.join(output_dir, 'sweep.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    if knee is not None:
+        print(f"📊 K sweep: inertia knee at K={knee}, see {output_dir}/sweep.json")
+    else:
+        print(f"📊 K sweep: no clear knee in inertia, see {output_dir}/sweep.json")
+    return results
@@ -0,0 +1,69 @@
+import struct
+import zlib
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+COLOR_TYPES = {'L': (0, 1), 'RGB': (2, 3), 'RGBA': (6, 4)}
+
+
+class PngStreamWriter:
+    """Write an 8-bit PNG row band by row band without holding the full image.
+
+    Rows are stored unfiltered and deflated incrementally, so memory stays
+    bounded by the band passed to write_rows().
+    """
+
+    def __init__(self, path, width, height, mode='RGBA', dpi=None, compress_level=6):
+        if mode not in COLOR_TYPES:
+            raise ValueError("Unsupported PNG mode: " + mode)
+        self.path = path
+        self.width = width
+        self.height = height
+        self.mode = mode
+        self.rows_written = 0
+        self._channels = COLOR_TYPES[mode][1]
+        self._compressor = zlib.compressobj(compress_level)
+        self._file = open(path, 'wb')
+        self._file.write(PNG_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, COLOR_TYPES[mode][0], 0, 0, 0))
+        if dpi is not None:
+            ppm = [int(d / 0.0254 + 0.5) for d in dpi]
+            self._chunk(b'pHYs', struct.pack('>IIB', ppm[0], ppm[1], 1))
+
+    def _chunk(self, tag, data):
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(tag)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(tag))))
+
+    def write_rows(self, rows):
+        """Append a (rows, width[, channels]) uint8 band"""
+        rows = np.asarray(rows, dtype=np.uint8).reshape(len(rows), self.width * self._channels)
+        if self.rows_written + len(rows) > self.height:
+            raise ValueError(f"Too many rows for {self.path}")
+        raw = np.zeros((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+        raw[:, 1:] = rows
+        data = self._compressor.compress(raw.tobytes())
+        if data:
+            self._chunk(b'IDAT', data)
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"{self.path}: wrote {self.rows_written} of {self.height} rows")
+            self._chunk(b'IDAT', self._compressor.flush())
+            self._chunk(b'IEND', b'')
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
@@ -0,0 +1,125 @@
+"""Seeded pixel samplers for fitting on a fixed budget of pixels.
+
+Every strategy takes (n, size, rng, shape, bins) and returns sorted
+indices into the n flattened pixels, so the same sample can be gathered
+from an in-memory array or band by band from an ImageHandle. They need
+O(size) memory except "histogram", which needs the per-pixel color bins
+of color_bins() (2 bytes per pixel), so fit cost stays flat as images
+grow.
+"""
+import numpy as np
+
+HISTOGRAM_BITS = 4  # bits per channel for histogram strata, 4096 bins
+
+
+def color_bins(flat_data):
+    """Coarse (HISTOGRAM_BITS per channel) color bin of each (N, 3) uint8 pixel"""
+    shift = 8 - HISTOGRAM_BITS
+    return ((flat_data[:, 0] >> shift).astype(np.uint16) << (2 * HISTOGRAM_BITS)
+            | (flat_data[:, 1] >> shift).astype(np.uint16) << HISTOGRAM_BITS
+            | (flat_data[:, 2] >> shift).astype(np.uint16))
+
+
+def uniform_indices(n, size, rng, shape=None, bins=None):
+    """Simple random sample without replacement in O(size) memory.
+
+    Draws with replacement and drops repeats until `size` distinct indices
+    are found, then keeps a random `size` of them. Only budgets above half
+    the pixels fall back to choice(), whose permutation is then O(size).
+    """
+    if 2 * size > n:
+        return np.sort(rng.choice(n, size, replace=False))
+    picked = np.zeros(0, dtype=np.int64)
+    while len(picked) < size:
+        missing = size - len(picked)
+        picked = np.sort(np.concatenate((picked, rng.integers(0, n, missing + missing // 4 + 16))))
+        picked = picked[np.concatenate(([True], picked[1:] != picked[:-1]))]
+    return np.sort(picked[rng.choice(len(picked), size, replace=False)])
+
+
+def tile_indices(n, size, rng, shape=None, bins=None):
+    """One random pixel per cell of a regular grid sized to the budget.
+
+    Spreads the sample evenly over the image, so no region is left out by
+    chance. Without `shape` the pixels are treated as a single row.
+    """
+    h, w = shape if shape is not None else (1, n)
+    cell = max(1, int(np.sqrt(h * w / size)))
+    ys = np.arange(0, h, cell)
+    xs = np.arange(0, w, cell)
+    y = ys[:, None] + rng.integers(0, cell, (len(ys), len(xs)))
+    x = xs[None, :] + rng.integers(0, cell, (len(ys), len(xs)))
+    # Cells cut by the right/bottom edge only keep their in-image part
+    y = np.minimum(y, h - 1)
+    x = np.minimum(x, w - 1)
+    indices = (y * w + x).ravel()
+    if len(indices) > size:
+        indices = indices[rng.choice(len(indices), size, replace=False)]
+    return np.sort(indices)
+
+
+def histogram_indices(n, size, rng, shape=None, bins=None):
+    """Stratify by coarse color bins, allocating samples by sqrt(bin count).
+
+    Every occupied bin gets at least one pixel when the budget allows, so
+    small but distinct color regions are represented in the fit.
+    """
+    counts = np.bincount(bins, minlength=1 << (3 * HISTOGRAM_BITS))
+    occupied = np.flatnonzero(counts)
+    weights = np.sqrt(counts[occupied])
+    alloc = np.floor(size * weights / weights.sum()).astype(np.int64)
+    if size >= len(occupied):
+        alloc = np.maximum(alloc, 1)
+    alloc = np.minimum(alloc, counts[occupied])
+    # Hand out what rounding left over to the largest bins, ties at random
+    spare = size - alloc.sum()
+    if spare > 0:
+        room = counts[occupied] - alloc
+        for i in np.lexsort((rng.random(len(room)), -room)):
+            if spare <= 0:
+                break
+            extra = min(spare, room[i])
+            alloc[i] += extra
+            spare -= extra
+
+    # Stable sort of a 16-bit key is a radix sort, O(N)
+    order = np.argsort(bins, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(counts)))[occupied]
+    picks = []
+    for start, count, k in zip(starts, counts[occupied], alloc):
+        if k:
+            picks.append(order[start + rng.choice(count, k, replace=False)])
+    return np.sort(np.concatenate(picks)) if picks else np.zeros(0, dtype=np.int64)
+
+
+SAMPLERS = {
+    'uniform': uniform_indices,
+    'tile': tile_indices,
+    'histogram': histogram_indices,
+}
+
+
+def sample_indices(n, size, strategy='uniform', seed=42, shape=None, bins=None):
+    """Sorted indices of up to `size` of n pixels, drawn with a seeded sampler.
+
+    The same n, size, strategy, seed (and shape/bins) always give the same
+    indices. `shape` is the (H, W) image shape, used by "tile"; `bins` the
+    color_bins() of every pixel, required by "histogram".
+    """
+    if strategy not in SAMPLERS:
+        raise ValueError("Unsupported sample strategy: " + strategy)
+    if size >= n:
+        return np.arange(n)
+    if strategy == 'histogram' and bins is None:
+        raise ValueError("The histogram sampler needs the color bins of every pixel")
+    return SAMPLERS[strategy](n, size, np.random.default_rng(seed), shape, bins)
+
+
+def sample_pixels(flat_data, size, strategy='uniform', seed=42, shape=None):
+    """Draw up to `size` rows of (N, 3) flat_data with a seeded sampler"""
+    if strategy not in SAMPLERS:
+        raise ValueError("Unsupported sample strategy: " + strategy)
+    if size >= len(flat_data):
+        return flat_data
+    bins = color_bins(flat_data) if strategy == 'histogram' else None
+    return flat_data[sample_indices(len(flat_data), size, strategy, seed, shape, bins)]
@@ -0,0 +1,330 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue
+from urllib.parse import parse_qs, urlparse
+
+from utils.lab_lut import load_lab_lut
+from utils.pipeline import load_settings, separate_image
+
+# Settings that point at server-side paths, or that separate_image does
+# not use (sweeps), clients cannot override them
+LOCKED_SETTINGS = {
+    'INPUT_IMAGE', 'OUTPUT_DIR', 'OUTPUT_SMOOTH_DIR', 'PALETTE_CACHE_DIR',
+    'PALETTE_CACHE_MAX_BYTES', 'METRICS_PATH', 'PROFILE_PATH', 'NUM_COLORS_SWEEP',
+}
+# Inclusive per-request range of settings that size buffers or work;
+# None as the upper bound means the server's own value
+SETTING_LIMITS = {
+    'NUM_COLORS': (2, 64),
+    'EXPORT_WORKERS': (1, None),
+    'FIT_SAMPLE_SIZE': (1, None),
+    'MINIBATCH_SIZE': (1, None),
+    'TILE_ROWS': (1, None),
+    'DOT_SIZE': (1, 64),
+    'GMM_BLUR_RADIUS': (0, 16),
+    'DESPECKLE_MODE_SIZE': (0, 9),
+    'DESPECKLE_MIN_AREA': (0, 1024),
+}
+LATENCY_WINDOW = 1000
+OUTPUT_SUBDIRS = ('layers', 'smooth_layers')
+
+
+class QueueFull(Exception):
+    """Raised by SeparationService.submit when every slot is taken"""
+
+
+def parse_overrides(query, defaults):
+    """Turn ?num_colors=8&use_lab_colorspace=false into typed config overrides.
+
+    Values outside SETTING_LIMITS and settings without a plain bool,
+    number or string default are rejected with ValueError.
+    """
+    overrides = {}
+    for key, values in query.items():
+        name = key.upper()
+        if name not in defaults:
+            raise ValueError("Unknown setting: " + key)
+        if name in LOCKED_SETTINGS or name.startswith('SERVICE_'):
+            raise ValueError("Setting cannot be changed per request: " + key)
+        value, default = values[-1], defaults[name]
+        if isinstance(default, bool):
+            if value.lower() not in ('1', '0', 'true', 'false', 'yes', 'no'):
+                raise ValueError(f"Expected a boolean for {key}, got {value!r}")
+            value = value.lower() in ('1', 'true', 'yes')
+        elif isinstance(default, (int, float)):
+            value = type(default)(value)
+        elif not isinstance(default, str):
+            raise ValueError("Setting cannot be changed per request: " + key)
+        if name in SETTING_LIMITS:
+            low, high = SETTING_LIMITS[name]
+            high = default if high is None else high
+            if not low <= value <= high:
+                raise ValueError(f"{key} must be between {low} and {high}, got {value}")
+        overrides[name] = value
+    return overrides
+
+
+def zip_outputs(job_dir, zip_path, subdirs=OUTPUT_SUBDIRS):
+    """Store the exported files under their paths relative to job_dir.
+
+    PNG and TIFF layers are already compressed, so entries are stored as-is.
+    """
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_STORED) as archive:
+        for subdir in subdirs:
+            for root, _, files in os.walk(os.path.join(job_dir, subdir)):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    archive.write(path, os.path.relpath(path, job_dir))
+
+
+class Job:
+    """One submitted image, `done` is set once the zip or the error is ready"""
+
+    def __init__(self, image_path, job_dir, overrides):
+        self.image_path = image_path
+        self.job_dir = job_dir
+        self.overrides = overrides
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self.zip_path = None
+        self.centers = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class SeparationService:
+    """Warm in-process separation with bounded concurrency.
+
+    `workers` threads run jobs, at most `max_queue` more wait for a thread,
+    and submit() raises QueueFull beyond that so callers can shed load.
+    Imports, settings and the Lab table stay loaded between jobs.
+    """
+
+    def __init__(self, workers=1, max_queue=8, overrides=None, separate_fn=separate_image):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.overrides = overrides or {}
+        self.separate_fn = separate_fn
+        self.defaults = vars(load_settings(**self.overrides))
+        self._jobs = Queue()
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._counts = {'completed': 0, 'failed': 0, 'rejected': 0}
+        self._latency = deque(maxlen=LATENCY_WINDOW)
+        self._threads = []
+
+    def start(self):
+        if self.defaults['USE_LAB_COLORSPACE']:
+            load_lab_lut()
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def reserve(self):
+        """Take a job slot, raises QueueFull when workers + max_queue jobs are admitted"""
+        with self._lock:
+            if self._admitted >= self.workers + self.max_queue:
+                self._counts['rejected'] += 1
+                raise QueueFull()
+            self._admitted += 1
+
+    def release(self):
+        """Give back a reserve()d slot that will not be submitted"""
+        with self._lock:
+            self._admitted -= 1
+
+    def submit(self, image_path, job_dir, overrides=None, reserved=False):
+        """Queue a job, raises QueueFull when workers + max_queue jobs are admitted.
+
+        With `reserved` the job takes a slot already held from reserve(),
+        which the caller releases if submit raises.
+        """
+        settings = load_settings(**dict(self.overrides, **(overrides or {})))
+        if not reserved:
+            self.reserve()
+        job = Job(image_path, job_dir, settings)
+        self._jobs.put(job)
+        return job
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            with self._lock:
+                self._running += 1
+            job.started = time.perf_counter()
+            try:
+                job.centers = self.separate_fn(
+                    job.image_path,
+                    os.path.join(job.job_dir, OUTPUT_SUBDIRS[0]),
+                    os.path.join(job.job_dir, OUTPUT_SUBDIRS[1]),
+                    job.overrides
+                )
+                job.zip_path = os.path.join(job.job_dir, 'layers.zip')
+                zip_outputs(job.job_dir, job.zip_path)
+            except Exception as e:
+                job.error = e
+            job.finished = time.perf_counter()
+            with self._lock:
+                self._running -= 1
+                self._admitted -= 1
+                self._counts['failed' if job.error else 'completed'] += 1
+                self._latency.append((job.started - job.submitted, job.finished - job.started))
+            job.done.set()
+
+    def stats(self):
+        """Queue depth, counters and latency percentiles over the last jobs"""
+        with self._lock:
+            latency = list(self._latency)
+            stats = dict(self._counts, running=self._running, queued=self._admitted - self._running,
+                         workers=self.workers, max_queue=self.max_queue)
+        for name, values in [('wait', [w for w, _ in latency]),
+                             ('run', [r for _, r in latency]),
+                             ('total', [w + r for w, r in latency])]:
+            values.sort()
+            stats[name + '_seconds'] = {
+                'mean': round(sum(values) / len(values), 4) if values else None,
+                'p50': round(values[len(values) // 2], 4) if values else None,
+                'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 4) if values else None,
+            }
+        return stats
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """POST /separate?<setting>=<value> with the image as body, GET /stats, GET /health"""
+
+    service = None
+    max_upload_bytes = None
+    chunk_size = 1 << 16
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/stats':
+            self._send_json(200, self.service.stats())
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/separate':
+            self._send_json(404, {'error': 'not found'})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0:
+            self._send_json(400, {'error': 'empty body, send the image bytes'})
+            return
+        if self.max_upload_bytes and length > self.max_upload_bytes:
+            self.close_connection = True
+            self._send_json(413, {'error': f'image larger than {self.max_upload_bytes} bytes'})
+            return
+
+        query = parse_qs(url.query)
+        # Only used for its extension (.npy inputs are memory-mapped)
+        filename = os.path.basename(query.pop('filename', ['input'])[-1])
+        try:
+            overrides = parse_overrides(query, self.service.defaults)
+        except ValueError as e:
+            self._copy_body(length, None)
+            self._send_json(400, {'error': str(e)})
+            return
+
+        # Admit before reading the upload, so a full queue costs a rejected
+        # client no transfer or disk write; the unread body ends the connection
+        try:
+            self.service.reserve()
+        except QueueFull:
+            self.close_connection = True
+            self._send_json(503, {'error': 'queue full, retry later'}, {'Retry-After': '1'})
+            return
+
+        job = None
+        job_dir = tempfile.mkdtemp(prefix='separation_')
+        try:
+            image_path = os.path.join(job_dir, 'input' + os.path.splitext(filename)[1])
+            with open(image_path, 'wb') as f:
+                received = self._copy_body(length, f)
+            if received < length:
+                self.close_connection = True
+                self._send_json(400, {'error': f'upload ended after {received} of {length} bytes'})
+                return
+            job = self.service.submit(image_path, job_dir, overrides, reserved=True)
+            job.done.wait()
+            if job.error is not None:
+                self._send_json(500, {'error': repr(job.error)})
+                return
+            self._send_zip(job)
+        finally:
+            if job is None:
+                self.service.release()
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def _copy_body(self, length, out):
+        """Read the request body in chunks, discarding it when `out` is None.
+
+        Returns the bytes read, fewer than `length` when the client hung up.
+        """
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(self.chunk_size, remaining))
+            if not chunk:
+                break
+            if out is not None:
+                out.write(chunk)
+            remaining -= len(chunk)
+        return length - remaining
+
+    def _send_zip(self, job):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header('Content-Length', str(os.path.getsize(job.zip_path)))
+        self.send_header('X-Queue-Seconds', f"{job.started - job.submitted:.3f}")
+        self.send_header('X-Run-Seconds', f"{job.finished - job.started:.3f}")
+        if job.centers is not None:
+            self.send_header('X-Centers', ','.join('{:02x}{:02x}{:02x}'.format(*c) for c in job.centers))
+        self.end_headers()
+        with open(job.zip_path, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, self.chunk_size)
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+
+def make_server(service, host='127.0.0.1', port=8765, max_upload_bytes=None):
+    """HTTP server bound to `service`, port 0 picks a free port"""
+    handler = type('BoundServiceHandler', (ServiceHandler,), {
+        'service': service,
+        'max_upload_bytes': max_upload_bytes,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from utils.assign import nearest_center, assign_labels, LabelCache
+
+class TestAssign(unittest.TestCase):
+    def setUp(self):
+        self.centers = np.array([[0, 0, 0], [255, 0, 0], [0, 255, 0], [255, 255, 255]], dtype=float)
+        self.flat_data = np.random.randint(0, 256, (1000, 3), dtype=np.uint8)
+
+    def brute_force(self, points):
+        return np.linalg.norm(points[:, None, :].astype(float) - self.centers[None], axis=2).argmin(axis=1)
+
+    def test_nearest_center_matches_brute_force(self):
+        labels = nearest_center(self.flat_data, self.centers, chunk_size=64)
+        np.testing.assert_array_equal(labels, self.brute_force(self.flat_data))
+
+    def test_assign_labels_predicts_each_color_once(self):
+        data = np.concatenate([self.flat_data, self.flat_data])
+        calls = []
+        def predict(colors):
+            calls.append(len(colors))
+            return self.brute_force(colors)
+        labels = assign_labels(data, predict)
+        np.testing.assert_array_equal(labels, self.brute_force(data))
+        self.assertEqual(calls, [len(np.unique(self.flat_data, axis=0))])
+
+    def test_label_cache_only_predicts_new_colors(self):
+        calls = []
+        def predict(colors):
+            calls.append(len(colors))
+            return self.brute_force(colors)
+        assign = LabelCache(predict, len(self.centers))
+        first = assign(self.flat_data[:500])
+        second = assign(self.flat_data)
+        np.testing.assert_array_equal(first, self.brute_force(self.flat_data[:500]))
+        np.testing.assert_array_equal(second, self.brute_force(self.flat_data))
+        self.assertEqual(sum(calls), len(np.unique(self.flat_data, axis=0)))
+        assign(self.flat_data)
+        self.assertEqual(len(calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from PIL import Image
+from utils.batch_runner import collect_inputs, job_dirs, run_batch
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.image_dir = os.path.join(self.test_dir, 'images')
+        os.makedirs(self.image_dir)
+        for name in ['a.png', 'b.png']:
+            arr = np.random.randint(0, 255, (12, 12, 3), dtype=np.uint8)
+            Image.fromarray(arr).save(os.path.join(self.image_dir, name))
+        with open(os.path.join(self.image_dir, 'notes.md'), 'w') as f:
+            f.write('not an image')
+        self.out_root = os.path.join(self.test_dir, 'out')
+        self.overrides = {
+            'NUM_COLORS': 2,
+            'USE_LAB_COLORSPACE': False,
+            'EXPORT_WORKERS': 1,
+            'PALETTE_CACHE_DIR': os.path.join(self.test_dir, 'cache'),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def run_quiet(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return run_batch([self.image_dir], self.out_root, overrides=self.overrides, **kwargs)
+
+    def test_collect_inputs(self):
+        a = os.path.join(self.image_dir, 'a.png')
+        b = os.path.join(self.image_dir, 'b.png')
+        self.assertEqual(collect_inputs([self.image_dir]), [a, b])
+        self.assertEqual(collect_inputs([os.path.join(self.image_dir, 'b*.png'), a]), [b, a])
+        manifest = os.path.join(self.image_dir, 'list.txt')
+        with open(manifest, 'w') as f:
+            f.write('# nightly\nb.png\n\na.png\n')
+        self.assertEqual(collect_inputs([manifest]), [b, a])
+
+    def test_job_dirs_are_unique(self):
+        dirs = job_dirs(['x/a.png', 'y/a.jpg', 'b.png'], 'out')
+        self.assertEqual(dirs, [os.path.join('out', 'a'), os.path.join('out', 'a_2'), os.path.join('out', 'b')])
+
+    def test_run_and_resume(self):
+        summary = self.run_quiet(workers=1)
+        self.assertEqual(summary['done'], 2)
+        for name in ['a', 'b']:
+            job_dir = os.path.join(self.out_root, name)
+            self.assertTrue(os.path.exists(os.path.join(job_dir, 'job.json')))
+            self.assertTrue(os.listdir(os.path.join(job_dir, 'layers')))
+
+        shutil.rmtree(os.path.join(self.out_root, 'b'))
+        summary = self.run_quiet(workers=1)
+        self.assertEqual((summary['done'], summary['skipped']), (1, 1))
+        with open(os.path.join(self.out_root, 'batch_summary.json')) as f:
+            self.assertEqual([r['status'] for r in json.load(f)['images']], ['skipped', 'done'])
+
+    def test_new_input_does_not_take_finished_dir(self):
+        """An input sorting ahead of a finished one with the same stem gets its own dir"""
+        for sub in ['a', 'b']:
+            os.makedirs(os.path.join(self.test_dir, sub))
+        arr = np.random.randint(0, 255, (12, 12, 3), dtype=np.uint8)
+        b_path = os.path.join(self.test_dir, 'b', 'x.png')
+        Image.fromarray(arr).save(b_path)
+        pattern = os.path.join(self.test_dir, '*', 'x.png')
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_batch([pattern], self.out_root, workers=1, overrides=self.overrides)
+            a_path = os.path.join(self.test_dir, 'a', 'x.png')
+            Image.fromarray(arr).save(a_path)
+            summary = run_batch([pattern], self.out_root, workers=1, overrides=self.overrides)
+        records = {r['input']: r for r in summary['images']}
+        self.assertEqual(records[a_path]['status'], 'done')
+        self.assertEqual(records[a_path]['output'], os.path.join(self.out_root, 'x_2'))
+        self.assertEqual(records[b_path]['status'], 'skipped')
+        self.assertEqual(records[b_path]['output'], os.path.join(self.out_root, 'x'))
+
+    def test_process_pool(self):
+        summary = self.run_quiet(workers=2)
+        self.assertEqual(summary['done'], 2)
+        self.assertTrue(all(r['seconds'] > 0 for r in summary['images']))
+
+    def test_failed_job_is_reported(self):
+        self.overrides['CLUSTER_ALGORITHM'] = 'dbscan'
+        summary = self.run_quiet(workers=1)
+        self.assertEqual(summary['failed'], 2)
+        self.assertFalse(os.path.exists(os.path.join(self.out_root, 'a', 'job.json')))
+
+if __name__ == '__main__':
+    unittest.main()
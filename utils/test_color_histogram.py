@@ -0,0 +1,38 @@
+import unittest
+import numpy as np
+from utils import color_histogram
+from utils.color_histogram import pack_rgb, unpack_rgb, unique_colors, weighted_resample
+
+class TestColorHistogram(unittest.TestCase):
+    def setUp(self):
+        self.flat_data = np.random.randint(0, 4, (500, 3), dtype=np.uint8) * 60
+
+    def test_pack_roundtrip(self):
+        np.testing.assert_array_equal(unpack_rgb(pack_rgb(self.flat_data)), self.flat_data)
+        self.assertEqual(pack_rgb(np.array([[0x12, 0x34, 0x56]], dtype=np.uint8))[0], 0x123456)
+
+    def test_unique_colors_reconstructs_pixels(self):
+        colors, counts, inverse = unique_colors(self.flat_data)
+        np.testing.assert_array_equal(colors[inverse], self.flat_data)
+        self.assertEqual(counts.sum(), len(self.flat_data))
+        self.assertEqual(len(colors), len(np.unique(self.flat_data, axis=0)))
+
+    def test_dense_and_sorted_paths_agree(self):
+        expected = unique_colors(self.flat_data)
+        original = color_histogram.DENSE_HISTOGRAM_MIN_PIXELS
+        color_histogram.DENSE_HISTOGRAM_MIN_PIXELS = 0
+        try:
+            dense = unique_colors(self.flat_data)
+        finally:
+            color_histogram.DENSE_HISTOGRAM_MIN_PIXELS = original
+        for a, b in zip(expected, dense):
+            np.testing.assert_array_equal(a, b)
+
+    def test_weighted_resample(self):
+        colors = np.array([[0, 0, 0], [255, 255, 255]], dtype=np.uint8)
+        sample = weighted_resample(colors, np.array([0, 10]), 50)
+        self.assertEqual(sample.shape, (50, 3))
+        self.assertTrue(np.all(sample == 255))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import contextlib
+import io
+import numpy as np
+from utils.despeckle import despeckle, mode_filter, small_components, remove_small_components
+from utils import metrics
+
+class TestDespeckle(unittest.TestCase):
+    def setUp(self):
+        self.labels = np.zeros((40, 50), dtype=np.uint8)
+        self.labels[:, 25:] = 1
+        self.labels[10, 10] = 2          # isolated pixel
+        self.labels[20:23, 5:8] = 2      # 3x3 speck
+        self.labels[30:40, 30:40] = 2    # large region, kept
+
+    def test_mode_filter(self):
+        """Single pixels go, straight edges and large regions stay"""
+        result = mode_filter(self.labels, 3)
+        self.assertEqual(result[10, 10], 0)
+        np.testing.assert_array_equal(result[:, 24:26], self.labels[:, 24:26])
+        self.assertTrue((result[31:39, 31:39] == 2).all())
+        self.assertEqual(result.dtype, self.labels.dtype)
+
+    def test_small_components(self):
+        small = small_components(self.labels, 16)
+        self.assertEqual(small.sum(), 1 + 9)
+        self.assertTrue(small[21, 6] and small[10, 10])
+        cleaned = remove_small_components(self.labels, 16)
+        self.assertTrue((cleaned[:, :25] == 0).all())
+        np.testing.assert_array_equal(cleaned[:, 25:], self.labels[:, 25:])
+
+    def test_bands_match_whole_image(self):
+        """Row bands with halo give the same map as one pass over the image"""
+        for seed, k, mode_size, min_area in [(0, 4, 0, 16), (1, 8, 3, 16), (2, 2, 5, 8), (3, 8, 0, 40)]:
+            labels = np.random.default_rng(seed).integers(0, k, (200, 60)).astype(np.uint8)
+            with contextlib.redirect_stdout(io.StringIO()):
+                banded = despeckle(labels, mode_size=mode_size, min_area=min_area, band_rows=32)
+            filtered = mode_filter(labels, mode_size) if mode_size else labels
+            whole = remove_small_components(filtered, min_area)
+            np.testing.assert_array_equal(banded, whole)
+            self.assertFalse(np.array_equal(banded, labels))
+
+    def test_mode_size(self):
+        """Large windows count correctly, even sizes are rejected"""
+        labels = np.zeros((40, 40), dtype=np.uint8)
+        labels[:, :18] = 1
+        result = mode_filter(labels, 17)
+        self.assertTrue((result[:, :18] == 1).all() and (result[:, 18:] == 0).all())
+        with self.assertRaises(ValueError):
+            mode_filter(labels, 4)
+
+    def test_metrics_and_copy(self):
+        metrics.enable()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = despeckle(self.labels, mode_size=3, min_area=16, band_rows=8)
+        finally:
+            records = metrics.disable()
+        self.assertEqual(self.labels[10, 10], 2)
+        record = [r for r in records if r['stage'] == 'despeckle'][0]
+        self.assertEqual(record['pixels_reassigned'], int((result != self.labels).sum()))
+        self.assertGreaterEqual(record['pixels_reassigned'], 10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            unchanged = despeckle(self.labels, mode_size=0, min_area=0)
+        self.assertIsNot(unchanged, self.labels)
+        np.testing.assert_array_equal(unchanged, self.labels)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 import numpy as np
 from sklearn.mixture import GaussianMixture
-from utils.gmm_cpu import gmm_cpu
+from utils.gmm_cpu import gmm_cpu, gmm_soft_cpu, gmm_labels_cpu
 
 class TestGMMCPU(unittest.TestCase):
     def setUp(self):
@@ -73,5 +73,34 @@ class TestGMMCPU(unittest.TestCase):
             _, centers, _ = gmm_cpu(self.sample_data, k=k, covariance_type='full')
             self.assertEqual(len(centers), k)
 
+    def test_soft_matches_dense(self):
+        """Test chunked soft masks agree with the dense probabilities"""
+        labels, centers, probs = gmm_cpu(self.large_data, k=3, covariance_type='full')
+        labels_s, centers_s, soft = gmm_soft_cpu(self.large_data, k=3, covariance_type='full', chunk_size=7)
+        
+        self.assertEqual(labels_s.shape, (10, 10))
+        self.assertEqual(soft.shape, (3, 10, 10))
+        self.assertEqual(soft.dtype, np.uint8)
+        np.testing.assert_array_equal(centers, centers_s)
+        np.testing.assert_array_equal(labels.reshape((10, 10)), labels_s)
+        expected = (probs * 255).astype(np.uint8).T.reshape((3, 10, 10))
+        self.assertLessEqual(np.abs(soft.astype(int) - expected).max(), 1)
+
+    def test_soft_histogram_mode(self):
+        """Test histogram mode gives one label and soft value per distinct color"""
+        data = self.sample_data.repeat(2, axis=1)
+        labels, centers, soft = gmm_soft_cpu(data, k=3, covariance_type='diag', use_histogram=True)
+        self.assertEqual(labels.shape, (3, 6))
+        self.assertEqual(soft.shape, (3, 3, 6))
+        np.testing.assert_array_equal(labels[:, 0::2], labels[:, 1::2])
+        np.testing.assert_array_equal(soft[:, :, 0::2], soft[:, :, 1::2])
+
+    def test_labels_match_dense(self):
+        """Test the hard-label path agrees with gmm_cpu"""
+        labels, centers, _ = gmm_cpu(self.large_data, k=3, covariance_type='full')
+        labels_h, centers_h = gmm_labels_cpu(self.large_data, k=3, covariance_type='full')
+        np.testing.assert_array_equal(labels.reshape((10, 10)), labels_h)
+        np.testing.assert_array_equal(centers, centers_h)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
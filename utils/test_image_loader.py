@@ -3,7 +3,7 @@ import os
 import tempfile
 import numpy as np
 from PIL import Image
-from utils.image_loader import load_image, save_image
+from utils.image_loader import load_image, save_image, open_image
 
 class TestImageFunctions(unittest.TestCase):
     def setUp(self):
@@ -72,6 +72,49 @@ class TestImageFunctions(unittest.TestCase):
             self.assertEqual(round(dpi[0]), 72)
             self.assertEqual(round(dpi[1]), 72)
         
+    def test_handle_metadata(self):
+        """Shape, DPI and format are available without decoding"""
+        with open_image(self.test_jpg_path) as handle:
+            self.assertEqual(handle.shape, (100, 100, 3))
+            self.assertEqual(handle.format, 'JPEG')
+            self.assertAlmostEqual(handle.dpi[0], 150, places=2)
+            self.assertFalse(handle.is_mapped)
+
+    def test_handle_region_and_strided(self):
+        arr = load_image(self.test_image_path)['array']
+        with open_image(self.test_image_path) as handle:
+            np.testing.assert_array_equal(handle.read_region((10, 20, 30, 25)), arr[20:25, 10:30])
+            for step in [2, 3, 7]:
+                np.testing.assert_array_equal(handle.read_strided(step, band_rows=16), arr[::step, ::step])
+        with open_image(self.test_jpg_path) as handle:
+            for step in [2, 3, 8]:
+                self.assertEqual(handle.read_strided(step).shape, arr[::step, ::step].shape)
+
+    def test_memory_mapped_inputs(self):
+        arr = load_image(self.test_image_path)['array']
+        npy_path = os.path.join(self.test_dir, 'test.npy')
+        raw_path = os.path.join(self.test_dir, 'test.raw')
+        np.save(npy_path, arr)
+        arr.tofile(raw_path)
+
+        loaded = load_image(npy_path)
+        self.assertIsInstance(loaded['array'], np.memmap)
+        np.testing.assert_array_equal(loaded['array'], arr)
+        with self.assertRaises(ValueError):
+            open_image(raw_path)
+        with open_image(raw_path, shape=(100, 100)) as handle:
+            self.assertTrue(handle.is_mapped)
+            np.testing.assert_array_equal(handle.read_region((0, 50, 100, 60)), arr[50:60])
+            sample = handle.sample_pixels(500)
+            self.assertEqual(sample.shape, (500, 3))
+
+        output_path = os.path.join(self.test_dir, 'from_npy.png')
+        save_image(loaded['array'], output_path, loaded)
+        del loaded
+        with Image.open(output_path) as saved_img:
+            self.assertEqual(saved_img.format, 'PNG')
+            np.testing.assert_array_equal(np.array(saved_img), arr)
+
     def test_invalid_image_path(self):
         """Test loading with invalid path raises appropriate exception"""
         with self.assertRaises(FileNotFoundError):
@@ -1,7 +1,10 @@
 import unittest
+import os
+import tempfile
 import numpy as np
 from skimage.color import rgb2lab
-from utils.kmeans_cpu import kmeans_cpu
+from utils.kmeans_cpu import kmeans_cpu, kmeans_minibatch_cpu, kmeans_minibatch_fit, kmeans_sweep, inertia_knee
+from utils.image_loader import open_image
 import warnings
 from sklearn.exceptions import ConvergenceWarning
 
@@ -69,6 +72,94 @@ class TestKMeansCPU(unittest.TestCase):
         np.testing.assert_array_equal(labels1, labels2)
         np.testing.assert_array_equal(centers1, centers2)
 
+    def test_histogram_mode(self):
+        """Test fitting on unique colors labels every pixel consistently"""
+        flat_art = self.sample_data.repeat(4, axis=0).repeat(4, axis=1)
+        labels, centers = kmeans_cpu(flat_art, k=3, use_histogram=True, use_lab_space=True)
+        self.assertEqual(labels.shape, flat_art.shape[:2])
+        self.assertEqual(centers.shape, (3, 3))
+        flat = flat_art.reshape((-1, 3))
+        flat_labels = labels.ravel()
+        for color in np.unique(flat, axis=0):
+            same = np.all(flat == color, axis=1)
+            self.assertEqual(len(np.unique(flat_labels[same])), 1)
+
+    def test_precision_mode_from_handle(self):
+        """Test precision mode on a lazy handle labels every band consistently"""
+        flat_art = self.sample_data.repeat(40, axis=0).repeat(4, axis=1)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'art.npy')
+            np.save(path, flat_art)
+            with open_image(path) as handle:
+                labels, centers = kmeans_cpu(handle, k=3, precision_mode=True, use_lab_space=True)
+        self.assertEqual(labels.shape, flat_art.shape[:2])
+        self.assertEqual(labels.dtype, np.uint8)
+        self.assertEqual(centers.shape, (3, 3))
+        flat = flat_art.reshape((-1, 3))
+        flat_labels = labels.ravel()
+        for color in np.unique(flat, axis=0):
+            same = np.all(flat == color, axis=1)
+            self.assertEqual(len(np.unique(flat_labels[same])), 1)
+
+    def test_sweep(self):
+        """Test a K sweep returns one consistent palette per K"""
+        flat_art = self.sample_data.repeat(4, axis=0).repeat(4, axis=1)
+        for sample_size in [200_000, 30]:
+            results = kmeans_sweep(flat_art, [5, 3, 7], ensure_green=True, use_lab_space=True,
+                                   sample_size=sample_size)
+            self.assertEqual([r['k'] for r in results], [3, 5, 7])
+            for r in results:
+                self.assertEqual(r['labels'].shape, flat_art.shape[:2])
+                self.assertEqual(r['centers'].shape, (r['k'], 3))
+                self.assertLess(r['labels'].max(), r['k'])
+            inertias = [r['inertia'] for r in results]
+            self.assertEqual(inertias, sorted(inertias, reverse=True))
+        with self.assertRaises(ValueError):
+            kmeans_sweep(flat_art, [10])
+
+    def test_inertia_knee(self):
+        """Test the knee is where the inertia curve flattens"""
+        self.assertEqual(inertia_knee([3, 4, 5, 6, 7, 8], [100, 50, 20, 15, 12, 10]), 5)
+        self.assertIsNone(inertia_knee([3, 4, 5], [30, 20, 10]))
+        self.assertIsNone(inertia_knee([3, 4], [30, 10]))
+
+    def test_histogram_mode_fewer_colors_than_k(self):
+        """Test histogram mode falls back when there are fewer colors than clusters"""
+        solid_red = np.full((10, 10, 3), [255, 0, 0], dtype=np.uint8)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=ConvergenceWarning)
+            labels, centers = kmeans_cpu(solid_red, k=2, use_histogram=True)
+        self.assertEqual(len(centers), 2)
+
+    def test_minibatch(self):
+        """Test mini-batch backend returns a full label map and uint8 centers"""
+        labels, centers = kmeans_minibatch_cpu(self.large_data, k=3, use_lab_space=True, batch_size=32)
+        self.assertEqual(labels.shape, self.large_data.shape[:2])
+        self.assertEqual(centers.shape, (3, 3))
+        self.assertEqual(centers.dtype, np.uint8)
+        self.assertTrue(np.all(labels <= 2))
+
+    def test_minibatch_ensure_green(self):
+        """Test mini-batch keeps a green-dominant first center when seeded with green"""
+        np.random.seed(0)
+        _, centers = kmeans_minibatch_cpu(self.sample_data, k=3, ensure_green=True)
+        r, g, b = centers[0].astype(int)
+        self.assertGreater(g, r + 100)
+        self.assertGreater(g, b + 100)
+
+    def test_minibatch_seed_is_reproducible(self):
+        """Test mini-batch gives the same palette for the same seed"""
+        noise = np.random.default_rng(0).integers(0, 256, (40, 40, 3), dtype=np.uint8)
+        _, first = kmeans_minibatch_cpu(noise, k=4, ensure_green=True, batch_size=64, seed=3)
+        _, second = kmeans_minibatch_cpu(noise, k=4, ensure_green=True, batch_size=64, seed=3)
+        np.testing.assert_array_equal(first, second)
+
+    def test_minibatch_fit_streams_batches(self):
+        """Test partial_fit is fed every batch"""
+        batches = [self.large_data[i].reshape((-1, 3)) for i in range(10)]
+        kmeans = kmeans_minibatch_fit(iter(batches), k=2)
+        self.assertEqual(kmeans.n_steps_, 10)
+
     def test_edge_cases(self):
         """Test edge cases like single color image"""
         solid_red = np.full((10, 10, 3), [255, 0, 0], dtype=np.uint8)
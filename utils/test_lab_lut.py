@@ -0,0 +1,52 @@
+import unittest
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import numpy as np
+from skimage.color import rgb2lab
+from utils import lab_lut
+from utils.kmeans_cpu import kmeans_cpu
+
+class TestLabLut(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.test_dir = tempfile.mkdtemp()
+        cls.original_path = lab_lut.LUT_PATH
+        lab_lut.LUT_PATH = os.path.join(cls.test_dir, 'rgb2lab.npy')
+        with contextlib.redirect_stdout(io.StringIO()):
+            lab_lut.load_lab_lut()
+
+    @classmethod
+    def tearDownClass(cls):
+        lab_lut.LUT_PATH = cls.original_path
+        lab_lut._lut = None
+        shutil.rmtree(cls.test_dir)
+
+    def test_lut_matches_rgb2lab(self):
+        """Test table lookup stays within float32 tolerance of rgb2lab"""
+        colors = np.random.randint(0, 256, (lab_lut.LUT_MIN_PIXELS, 3), dtype=np.uint8)
+        colors[:3] = [[0, 0, 0], [255, 255, 255], [0, 255, 0]]
+        lab = lab_lut.rgb_to_lab(colors)
+        self.assertEqual(lab.dtype, np.float32)
+        np.testing.assert_allclose(lab, rgb2lab(colors), atol=1e-3)
+
+    def test_small_input_uses_rgb2lab(self):
+        colors = np.random.randint(0, 256, (10, 3), dtype=np.uint8)
+        np.testing.assert_array_equal(lab_lut.rgb_to_lab(colors), rgb2lab(colors))
+
+    def test_table_is_memory_mapped(self):
+        self.assertIsInstance(lab_lut.load_lab_lut(), np.memmap)
+        self.assertEqual(lab_lut.load_lab_lut().shape, (1 << 24, 3))
+
+    def test_kmeans_precision_mode_with_lut(self):
+        """Test a small float64 sample and a large LUT-converted predict mix correctly"""
+        data = np.random.randint(0, 256, (300, 300, 3), dtype=np.uint8)
+        with contextlib.redirect_stdout(io.StringIO()):
+            labels, centers = kmeans_cpu(data, k=4, precision_mode=True, use_lab_space=True)
+        self.assertEqual(labels.shape, (300, 300))
+        self.assertTrue(np.all(labels < 4))
+
+if __name__ == '__main__':
+    unittest.main()
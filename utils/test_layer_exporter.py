@@ -1,9 +1,13 @@
 import unittest
+import json
 import os
 import tempfile
 import numpy as np
 from PIL import Image, ImageFilter
-from utils.layer_exporter import rgb_to_hex, export_layers, export_smooth_layers
+from utils.layer_exporter import (
+    rgb_to_hex, build_label_index, render_layer, export_layers, export_smooth_layers,
+    export_layers_tiled, export_smooth_layers_tiled, blur_halo
+)
 
 class TestLayerExport(unittest.TestCase):
     def setUp(self):
@@ -62,6 +66,43 @@ class TestLayerExport(unittest.TestCase):
             pixels = np.array(img)
             self.assertTrue(np.any(pixels[0,0] == [255, 0, 0, 255]))
 
+    def test_render_layer_matches_pixel_loop(self):
+        mask = np.random.rand(7, 9) > 0.8
+        color = (10, 20, 30)
+        for dot_size in [1, 2, 3]:
+            expected = np.zeros((7, 9, 4), dtype=np.uint8)
+            for y, x in zip(*np.where(mask)):
+                expected[y:y+dot_size, x:x+dot_size] = (*color, 255)
+            indices = np.flatnonzero(mask)
+            np.testing.assert_array_equal(render_layer(indices, mask.shape, color, dot_size), expected)
+
+    def test_render_layer_reuses_buffers(self):
+        indices = np.array([0, 5, 12])
+        out = np.full((4, 5, 4), 7, dtype=np.uint8)
+        mask = np.ones(20, dtype=bool)
+        for dot_size in [1, 2]:
+            layer = render_layer(indices, (4, 5), (1, 2, 3), dot_size, out=out, mask=mask)
+            self.assertIs(layer, out)
+            np.testing.assert_array_equal(layer, render_layer(indices, (4, 5), (1, 2, 3), dot_size))
+
+    def test_build_label_index(self):
+        order, offsets = build_label_index(self.labels, 4)
+        np.testing.assert_array_equal(np.diff(offsets), [3, 3, 3, 0])
+        for i in range(4):
+            np.testing.assert_array_equal(
+                np.sort(order[offsets[i]:offsets[i+1]]),
+                np.flatnonzero(self.labels.ravel() == i)
+            )
+
+    def test_export_layers_workers(self):
+        serial_dir = os.path.join(self.test_dir, 'serial')
+        export_layers(self.labels, self.centers, serial_dir, self.metadata, workers=1)
+        export_layers(self.labels, self.centers, self.output_dir, self.metadata, workers=3)
+        self.assertEqual(sorted(os.listdir(serial_dir)), sorted(os.listdir(self.output_dir)))
+        for name in os.listdir(serial_dir):
+            with open(os.path.join(serial_dir, name), 'rb') as a, open(os.path.join(self.output_dir, name), 'rb') as b:
+                self.assertEqual(a.read(), b.read())
+
     def test_export_smooth_layers(self):
         export_smooth_layers(
             self.labels, 
@@ -74,10 +115,89 @@ class TestLayerExport(unittest.TestCase):
         files = os.listdir(self.output_dir)
         self.assertIn('layer_0_#ff0000_hard.png', files)
 
+    def test_export_layers_tiled_matches_full(self):
+        labels = np.random.randint(0, 3, (11, 8))
+        full_dir = os.path.join(self.test_dir, 'full')
+        export_layers(labels, self.centers, full_dir, self.metadata, dot_size=3)
+        bands = ((y0, labels[y0:y0 + 4]) for y0 in range(0, 11, 4))
+        export_layers_tiled(bands, self.centers, self.output_dir, labels.shape, self.metadata, dot_size=3)
+        self.assertEqual(sorted(os.listdir(full_dir)), sorted(os.listdir(self.output_dir)))
+        for name in os.listdir(full_dir):
+            with Image.open(os.path.join(full_dir, name)) as a, Image.open(os.path.join(self.output_dir, name)) as b:
+                np.testing.assert_array_equal(np.array(a), np.array(b))
+                self.assertAlmostEqual(b.info['dpi'][0], 300, places=0)
+
+    def test_tiled_export_failure_keeps_error(self):
+        """A failing band source raises its own error and leaves no partial PNGs"""
+        def failing_bands():
+            yield 0, np.zeros((4, 8), dtype=np.uint8)
+            raise RuntimeError('decoder failed')
+
+        with self.assertRaisesRegex(RuntimeError, 'decoder failed'):
+            export_layers_tiled(failing_bands(), self.centers, self.output_dir, (11, 8), self.metadata)
+        self.assertEqual(os.listdir(self.output_dir), [])
+        def failing_smooth_bands():
+            raise RuntimeError('decoder failed')
+            yield
+
+        with self.assertRaisesRegex(RuntimeError, 'decoder failed'):
+            export_smooth_layers_tiled(failing_smooth_bands(), self.centers, self.output_dir, (11, 8), 1.5)
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+    def test_export_smooth_layers_tiled_matches_full(self):
+        h, w = 20, 6
+        probs = np.random.dirichlet(np.ones(3), h * w)
+        labels = probs.argmax(axis=1).reshape((h, w))
+        halo = blur_halo(1.5)
+        bands = []
+        for y0 in range(0, h, 7):
+            y1 = min(h, y0 + 7)
+            top, bottom = max(0, y0 - halo), min(h, y1 + halo)
+            soft = (probs[top * w:bottom * w] * 255).astype(np.uint8).T.reshape((3, -1, w))
+            bands.append((labels[top:bottom], soft, y0 - top, y1 - y0))
+        for mode in ['probability', 'antialias']:
+            full_dir = os.path.join(self.test_dir, 'full_' + mode)
+            tiled_dir = os.path.join(self.test_dir, 'tiled_' + mode)
+            export_smooth_layers(labels, self.centers, probs, full_dir, 1.5, self.metadata, mode=mode)
+            export_smooth_layers_tiled(bands, self.centers, tiled_dir, (h, w), 1.5, mode)
+            self.assertEqual(sorted(os.listdir(full_dir)), sorted(os.listdir(tiled_dir)))
+            for name in os.listdir(full_dir):
+                with Image.open(os.path.join(full_dir, name)) as a, Image.open(os.path.join(tiled_dir, name)) as b:
+                    np.testing.assert_array_equal(np.array(a), np.array(b))
+
+    def test_export_smooth_layers_soft_stack(self):
+        probs = np.random.dirichlet(np.ones(3), 9)
+        stack = (probs * 255).astype(np.uint8).T.reshape((3, 3, 3))
+        full_dir = os.path.join(self.test_dir, 'full')
+        export_smooth_layers(self.labels, self.centers, probs, full_dir, 1, self.metadata)
+        export_smooth_layers(self.labels, self.centers, stack, self.output_dir, 1, self.metadata)
+        for name in os.listdir(full_dir):
+            with Image.open(os.path.join(full_dir, name)) as a, Image.open(os.path.join(self.output_dir, name)) as b:
+                np.testing.assert_array_equal(np.array(a), np.array(b))
+
     def test_export_with_default_metadata(self):
         export_layers(self.labels, self.centers, self.output_dir, {})
         with Image.open(os.path.join(self.output_dir, 'layer_1_ff0000.png')) as img:
             self.assertEqual(tuple(round(x) for x in img.info['dpi']), (72, 72))
 
+    def test_export_layers_crop(self):
+        for dot_size in [1, 2]:
+            full_dir = os.path.join(self.test_dir, f'full{dot_size}')
+            crop_dir = os.path.join(self.test_dir, f'crop{dot_size}')
+            export_layers(self.labels, self.centers, full_dir, self.metadata, dot_size=dot_size)
+            export_layers(self.labels, self.centers, crop_dir, self.metadata, dot_size=dot_size, crop=True)
+            with open(os.path.join(crop_dir, 'layers.json')) as f:
+                sidecar = json.load(f)
+            self.assertEqual((sidecar['width'], sidecar['height']), (3, 3))
+            for entry in sidecar['layers']:
+                with Image.open(os.path.join(full_dir, entry['file'])) as full, \
+                        Image.open(os.path.join(crop_dir, entry['file'])) as cropped:
+                    x, y, w, h = entry['x'], entry['y'], entry['width'], entry['height']
+                    self.assertEqual(cropped.size, (w, h))
+                    self.assertEqual(tuple(round(d) for d in cropped.info['dpi']), (300, 300))
+                    np.testing.assert_array_equal(np.array(cropped), np.array(full)[y:y+h, x:x+w])
+                    # Nothing is lost outside the bounding box
+                    self.assertEqual(np.array(full)[..., 3].sum(), np.array(cropped)[..., 3].sum())
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
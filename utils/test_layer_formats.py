@@ -0,0 +1,65 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from PIL import Image
+from utils.layer_formats import export_indexed_png, export_layers_tiff
+
+class TestLayerFormats(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.labels = np.array([
+            [0, 0, 1],
+            [1, 1, 2],
+            [2, 2, 0]
+        ], dtype=np.uint8)
+        self.centers = np.array([
+            [255, 0, 0],
+            [0, 255, 0],
+            [0, 0, 255],
+            [10, 20, 30]    # Empty layer
+        ])
+        self.metadata = {'dpi': (300, 300), 'format': 'PNG'}
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def read_sidecar(self):
+        with open(os.path.join(self.output_dir, 'palette.json')) as f:
+            return json.load(f)
+
+    def test_indexed_png_roundtrip(self):
+        path = export_indexed_png(self.labels, self.centers, self.output_dir, self.metadata)
+        with Image.open(path) as img:
+            self.assertEqual(img.mode, 'P')
+            self.assertEqual(tuple(round(d) for d in img.info['dpi']), (300, 300))
+            np.testing.assert_array_equal(np.array(img), self.labels)
+            np.testing.assert_array_equal(np.array(img.convert('RGB')), self.centers[self.labels])
+        sidecar = self.read_sidecar()
+        self.assertEqual([c['hex'] for c in sidecar['colors']], ['#ff0000', '#00ff00', '#0000ff', '#0a141e'])
+        self.assertEqual([c['pixels'] for c in sidecar['colors']], [3, 3, 3, 0])
+
+    def test_indexed_png_rejects_large_palettes(self):
+        with self.assertRaises(ValueError):
+            export_indexed_png(self.labels, np.zeros((257, 3)), self.output_dir, self.metadata)
+
+    def test_tiff_pages(self):
+        path = export_layers_tiff(self.labels, self.centers, self.output_dir, self.metadata, dot_size=2)
+        sidecar = self.read_sidecar()
+        self.assertEqual(sidecar['pages'], [0, 1, 2])
+        with Image.open(path) as img:
+            self.assertEqual(img.n_frames, 3)
+            for page, layer in enumerate(sidecar['pages']):
+                img.seek(page)
+                self.assertEqual(img.mode, '1')
+                self.assertEqual(tuple(round(d) for d in img.info['dpi']), (300, 300))
+                hit = self.labels == layer
+                expected = hit.copy()
+                expected[1:, :] |= hit[:-1, :]
+                expected[:, 1:] |= expected[:, :-1].copy()
+                np.testing.assert_array_equal(np.array(img), expected)
+
+if __name__ == '__main__':
+    unittest.main()
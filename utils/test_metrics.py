@@ -0,0 +1,61 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from utils import metrics
+from utils.kmeans_cpu import kmeans_cpu
+from utils.layer_exporter import export_layers
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.report_path = os.path.join(self.test_dir, 'metrics.json')
+
+    def tearDown(self):
+        metrics.disable()
+        shutil.rmtree(self.test_dir)
+
+    def test_disabled_records_nothing(self):
+        with metrics.stage('noop') as record:
+            record['bytes_written'] = 1
+        self.assertEqual(metrics.disable(), [])
+
+    def test_session_writes_report(self):
+        data = np.random.randint(0, 255, (10, 10, 3), dtype=np.uint8)
+        with contextlib.redirect_stdout(io.StringIO()), metrics.session(self.report_path):
+            labels, centers = kmeans_cpu(data, k=2)
+            export_layers(labels, centers, os.path.join(self.test_dir, 'layers'), {})
+        with open(self.report_path) as f:
+            report = json.load(f)
+        summary = report['summary']
+        for name in ['kmeans_cpu', 'fit', 'export_layers', 'mask_building', 'png_encoding']:
+            self.assertIn(name, summary)
+        self.assertEqual(summary['png_encoding']['calls'], 2)
+        layer_bytes = sum(os.path.getsize(os.path.join(self.test_dir, 'layers', n))
+                          for n in os.listdir(os.path.join(self.test_dir, 'layers')))
+        self.assertEqual(summary['png_encoding']['bytes_written'], layer_bytes)
+        self.assertGreaterEqual(report['total_seconds'], summary['export_layers']['seconds'])
+
+    def test_timed_decorator(self):
+        @metrics.timed('double')
+        def double(x):
+            return 2 * x
+        self.assertEqual(double(2), 4)
+        metrics.enable()
+        self.assertEqual(double(3), 6)
+        records = metrics.disable()
+        self.assertEqual([r['stage'] for r in records], ['double'])
+
+    def test_profile_dump(self):
+        profile_path = os.path.join(self.test_dir, 'run.prof')
+        with metrics.session(profile_path=profile_path):
+            sum(range(1000))
+        self.assertTrue(os.path.exists(profile_path))
+        self.assertFalse(os.path.exists(self.report_path))
+
+if __name__ == '__main__':
+    unittest.main()
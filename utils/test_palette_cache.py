@@ -0,0 +1,115 @@
+import unittest
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+import numpy as np
+from PIL import Image
+from utils.image_loader import open_image
+from utils.palette_cache import cache_key, load_cached, store_cached, evict
+from utils.pipeline import load_settings, cluster_image_cached
+
+class TestPaletteCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.image = np.random.randint(0, 255, (8, 8, 3), dtype=np.uint8)
+        self.labels = np.random.randint(0, 3, (8, 8))
+        self.centers = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_key_depends_on_content_and_params(self):
+        key = cache_key(self.image, {'k': 3})
+        self.assertEqual(key, cache_key(self.image.copy(), {'k': 3}))
+        self.assertNotEqual(key, cache_key(self.image, {'k': 4}))
+        other = self.image.copy()
+        other[0, 0, 0] ^= 1
+        self.assertNotEqual(key, cache_key(other, {'k': 3}))
+
+    def test_handle_key_matches_array(self):
+        """A lazy handle hashed in bands gives the array's key"""
+        path = os.path.join(self.cache_dir, 'image.png')
+        Image.fromarray(self.image).save(path)
+        with open_image(path) as handle:
+            self.assertEqual(cache_key(handle, {'k': 3}, band_rows=3), cache_key(self.image, {'k': 3}))
+
+    def test_concurrent_eviction(self):
+        """Entries removed by another process mid-call are not errors"""
+        store_cached(self.cache_dir, 'a' * 64, self.labels, self.centers)
+        real_listdir = os.listdir
+        with mock.patch('utils.palette_cache.os.listdir', lambda d: real_listdir(d) + ['gone.npz']):
+            evict(self.cache_dir, 0)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        store_cached(self.cache_dir, 'b' * 64, self.labels, self.centers)
+        with mock.patch('utils.palette_cache.os.utime', side_effect=FileNotFoundError):
+            labels, centers, _ = load_cached(self.cache_dir, 'b' * 64)
+        np.testing.assert_array_equal(centers, self.centers)
+
+    def test_concurrent_store_same_key(self):
+        """Threads storing the same key do not share a temp file"""
+        errors = []
+        labels = np.random.randint(0, 3, (512, 512))
+
+        def store():
+            try:
+                for _ in range(5):
+                    store_cached(self.cache_dir, 'same', labels, self.centers)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=store) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.cache_dir), ['same.npz'])
+
+    def test_corrupt_entry_is_a_miss(self):
+        """A truncated entry is dropped instead of failing every later run"""
+        store_cached(self.cache_dir, 'abc', self.labels, self.centers)
+        path = os.path.join(self.cache_dir, 'abc.npz')
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) // 2)
+        self.assertIsNone(load_cached(self.cache_dir, 'abc'))
+        self.assertFalse(os.path.exists(path))
+
+    def test_roundtrip(self):
+        self.assertIsNone(load_cached(self.cache_dir, 'missing'))
+        soft = np.random.randint(0, 255, (3, 8, 8), dtype=np.uint8)
+        store_cached(self.cache_dir, 'abc', self.labels, self.centers, soft)
+        labels, centers, soft_masks = load_cached(self.cache_dir, 'abc')
+        self.assertEqual(labels.dtype, np.uint8)
+        np.testing.assert_array_equal(labels, self.labels)
+        np.testing.assert_array_equal(centers, self.centers)
+        np.testing.assert_array_equal(soft_masks, soft)
+
+    def test_lru_eviction(self):
+        for i, key in enumerate(['old', 'used', 'new']):
+            store_cached(self.cache_dir, key, self.labels, self.centers)
+            past = time.time() - 100 + i
+            os.utime(os.path.join(self.cache_dir, key + '.npz'), (past, past))
+        load_cached(self.cache_dir, 'used')
+        size = os.path.getsize(os.path.join(self.cache_dir, 'new.npz'))
+        evict(self.cache_dir, 2 * size)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), ['new.npz', 'used.npz'])
+
+    def test_cluster_image_cached_reports_hit_and_miss(self):
+        settings = load_settings(NUM_COLORS=2, USE_LAB_COLORSPACE=False, PALETTE_CACHE_DIR=self.cache_dir)
+        image_data = {'array': self.image}
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            first = cluster_image_cached(image_data, settings)
+            second = cluster_image_cached(image_data, settings)
+        self.assertIn('cache miss', out.getvalue())
+        self.assertIn('cache hit', out.getvalue())
+        np.testing.assert_array_equal(first[0], second[0])
+        np.testing.assert_array_equal(first[1], second[1])
+
+if __name__ == '__main__':
+    unittest.main()
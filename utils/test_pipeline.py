@@ -0,0 +1,73 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from PIL import Image
+from utils.image_loader import load_image, open_image
+from utils.pipeline import cluster_image, load_settings, separate_image, streams_input, sweep_image
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        arr = np.zeros((24, 20, 3), dtype=np.uint8)
+        arr[:, 10:] = [255, 0, 0]
+        arr[12:, :] = [0, 0, 255]
+        arr += np.random.default_rng(0).integers(0, 6, arr.shape, dtype=np.uint8)
+        self.path = os.path.join(self.test_dir, 'input.png')
+        Image.fromarray(arr).save(self.path, dpi=(300, 300))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_every_algorithm(self):
+        """separate_image runs for each CLUSTER_ALGORITHM, smooth and tiled setting"""
+        for algorithm in ['kmeans', 'minibatch', 'gmm']:
+            for smooth in [False, True]:
+                for tiled in [False, True]:
+                    with self.subTest(algorithm=algorithm, smooth=smooth, tiled=tiled):
+                        name = f"{algorithm}_{smooth}_{tiled}"
+                        output_dir = os.path.join(self.test_dir, name)
+                        smooth_dir = os.path.join(self.test_dir, name + '_smooth')
+                        # No green in the image, so a forced green center could stay empty
+                        settings = load_settings(
+                            CLUSTER_ALGORITHM=algorithm, GMM_EXPORT_SMOOTH=smooth, TILED_MODE=tiled,
+                            NUM_COLORS=3, TILE_ROWS=8, EXPORT_WORKERS=1, PALETTE_CACHE_DIR=None,
+                            MINIBATCH_SIZE=64, FORCE_GREEN_COLOR=False
+                        )
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            centers = separate_image(self.path, output_dir, smooth_dir, settings)
+                        self.assertEqual(len(centers), 3)
+                        if algorithm == 'gmm' and smooth:
+                            self.assertEqual(len(os.listdir(smooth_dir)), 6)
+                        else:
+                            self.assertEqual(len(os.listdir(output_dir)), 3)
+
+    def test_precision_kmeans_streams_input(self):
+        """The lazy handle path gives the same result as the decoded array"""
+        settings = load_settings(NUM_COLORS=3, FIT_SAMPLE_SIZE=100, PALETTE_CACHE_DIR=None)
+        self.assertTrue(streams_input(settings))
+        with contextlib.redirect_stdout(io.StringIO()):
+            with open_image(self.path) as handle:
+                lazy = cluster_image({'array': handle}, settings)
+            full = cluster_image(load_image(self.path), settings)
+        np.testing.assert_array_equal(lazy[0], full[0])
+        np.testing.assert_array_equal(lazy[1], full[1])
+
+    def test_sweep_flags_knee(self):
+        """sweep_image exports every K and flags at most one knee"""
+        settings = load_settings(NUM_COLORS_SWEEP=[2, 3, 4], EXPORT_WORKERS=1, PALETTE_CACHE_DIR=None)
+        output_dir = os.path.join(self.test_dir, 'sweep')
+        with contextlib.redirect_stdout(io.StringIO()):
+            sweep_image(self.path, output_dir, os.path.join(self.test_dir, 'smooth'), settings)
+        with open(os.path.join(output_dir, 'sweep.json')) as f:
+            summary = json.load(f)
+        self.assertEqual([entry['k'] for entry in summary], [2, 3, 4])
+        self.assertLessEqual(sum(entry['knee'] for entry in summary), 1)
+        self.assertTrue(os.path.isdir(os.path.join(output_dir, 'k3')))
+
+if __name__ == '__main__':
+    unittest.main()
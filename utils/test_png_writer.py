@@ -0,0 +1,43 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+from PIL import Image
+from utils.png_writer import PngStreamWriter
+
+class TestPngStreamWriter(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, 'out.png')
+
+    def tearDown(self):
+        for name in os.listdir(self.test_dir):
+            os.remove(os.path.join(self.test_dir, name))
+        os.rmdir(self.test_dir)
+
+    def test_roundtrip_rgba_in_bands(self):
+        arr = np.random.randint(0, 255, (13, 7, 4), dtype=np.uint8)
+        with PngStreamWriter(self.path, 7, 13, 'RGBA', dpi=(300, 300)) as writer:
+            for y0 in range(0, 13, 5):
+                writer.write_rows(arr[y0:y0 + 5])
+        with Image.open(self.path) as img:
+            self.assertEqual(img.mode, 'RGBA')
+            self.assertAlmostEqual(img.info['dpi'][0], 300, places=0)
+            np.testing.assert_array_equal(np.array(img), arr)
+
+    def test_roundtrip_grayscale(self):
+        arr = np.random.randint(0, 255, (4, 9), dtype=np.uint8)
+        with PngStreamWriter(self.path, 9, 4, 'L') as writer:
+            writer.write_rows(arr)
+        with Image.open(self.path) as img:
+            self.assertEqual(img.mode, 'L')
+            np.testing.assert_array_equal(np.array(img), arr)
+
+    def test_incomplete_image_raises(self):
+        writer = PngStreamWriter(self.path, 4, 4, 'L')
+        writer.write_rows(np.zeros((2, 4), dtype=np.uint8))
+        with self.assertRaises(ValueError):
+            writer.close()
+
+if __name__ == '__main__':
+    unittest.main()
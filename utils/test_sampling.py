@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+from PIL import Image
+import os
+import tempfile
+from utils.sampling import sample_pixels, color_bins, uniform_indices, tile_indices, histogram_indices
+from utils.image_loader import open_image
+from utils.kmeans_cpu import kmeans_cpu
+
+class TestSampling(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.image = rng.integers(0, 256, (60, 80, 3), dtype=np.uint8)
+        self.flat = self.image.reshape((-1, 3))
+
+    def test_reproducible(self):
+        """Same seed gives the same sample, another seed a different one"""
+        for strategy in ['uniform', 'tile', 'histogram']:
+            a = sample_pixels(self.flat, 500, strategy, seed=7, shape=(60, 80))
+            b = sample_pixels(self.flat, 500, strategy, seed=7, shape=(60, 80))
+            c = sample_pixels(self.flat, 500, strategy, seed=8, shape=(60, 80))
+            np.testing.assert_array_equal(a, b)
+            self.assertFalse(np.array_equal(a, c))
+            self.assertLessEqual(len(a), 500)
+            self.assertGreater(len(a), 400)
+
+    def test_small_input_and_bad_strategy(self):
+        self.assertIs(sample_pixels(self.flat, len(self.flat), 'tile'), self.flat)
+        with self.assertRaises(ValueError):
+            sample_pixels(self.flat, 10, 'random')
+
+    def test_uniform_indices(self):
+        """Distinct sorted indices for small and large budgets"""
+        for n, size in [(1_000_000, 5000), (100, 90)]:
+            indices = uniform_indices(n, size, np.random.default_rng(0))
+            self.assertEqual(len(np.unique(indices)), size)
+            self.assertTrue((np.diff(indices) > 0).all() and indices[-1] < n)
+
+    def test_handle_matches_array(self):
+        """An ImageHandle gives the same sample as the decoded array"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'image.png')
+            Image.fromarray(self.image).save(path)
+            with open_image(path) as handle:
+                for strategy in ['uniform', 'tile', 'histogram']:
+                    expected = sample_pixels(self.flat, 700, strategy, seed=5, shape=(60, 80))
+                    np.testing.assert_array_equal(handle.sample_pixels(700, 16, 5, strategy), expected)
+
+    def test_tile_covers_image(self):
+        """Every 10x10 cell of the image gets a sample"""
+        indices = tile_indices(len(self.flat), 48, np.random.default_rng(0), (60, 80))
+        self.assertEqual(len(np.unique(indices)), len(indices))
+        cells = set(zip(indices // 80 // 10, indices % 80 // 10))
+        self.assertEqual(len(cells), 48)
+
+    def test_histogram_keeps_rare_colors(self):
+        """A tiny color region is always in a histogram sample"""
+        image = np.zeros((100, 100, 3), dtype=np.uint8)
+        image[:, 50:] = [255, 255, 255]
+        image[0, :4] = [0, 255, 0]
+        flat = image.reshape((-1, 3))
+        indices = histogram_indices(len(flat), 20, np.random.default_rng(0), bins=color_bins(flat))
+        colors = {tuple(c) for c in flat[indices]}
+        self.assertIn((0, 255, 0), colors)
+        self.assertEqual(len(indices), 20)
+
+    def test_kmeans_precision_reproducible(self):
+        """precision_mode with a fixed seed gives identical results"""
+        for strategy in ['uniform', 'tile', 'histogram']:
+            first = kmeans_cpu(self.image, 3, ensure_green=True, precision_mode=True, sample_size=1000,
+                               sample_strategy=strategy, seed=3)
+            second = kmeans_cpu(self.image, 3, ensure_green=True, precision_mode=True, sample_size=1000,
+                                sample_strategy=strategy, seed=3)
+            np.testing.assert_array_equal(first[0], second[0])
+            np.testing.assert_array_equal(first[1], second[1])
+
+if __name__ == '__main__':
+    unittest.main()
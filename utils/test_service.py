@@ -0,0 +1,176 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+import numpy as np
+from PIL import Image
+from utils.service import SeparationService, QueueFull, make_server, parse_overrides
+
+class TestService(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        arr = np.zeros((12, 12, 3), dtype=np.uint8)
+        arr[:, 6:] = [255, 0, 0]
+        buffer = io.BytesIO()
+        Image.fromarray(arr).save(buffer, format='PNG', dpi=(300, 300))
+        self.image_bytes = buffer.getvalue()
+        self.overrides = {
+            'NUM_COLORS': 2,
+            'USE_LAB_COLORSPACE': False,
+            'EXPORT_WORKERS': 1,
+            'PALETTE_CACHE_DIR': None,
+        }
+        self.servers = []
+
+    def tearDown(self):
+        for server, service in self.servers:
+            server.shutdown()
+            server.server_close()
+            service.stop()
+        shutil.rmtree(self.test_dir)
+
+    def start(self, **kwargs):
+        service = SeparationService(overrides=self.overrides, **kwargs)
+        service.start()
+        server = make_server(service, port=0, max_upload_bytes=1 << 20)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.servers.append((server, service))
+        return f"http://127.0.0.1:{server.server_port}"
+
+    def post(self, url, body=None):
+        request = urllib.request.Request(url, data=body or self.image_bytes, method='POST')
+        with contextlib.redirect_stdout(io.StringIO()):
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.status, dict(response.headers), response.read()
+
+    def get_json(self, url):
+        with urllib.request.urlopen(url, timeout=30) as response:
+            return json.loads(response.read())
+
+    def test_parse_overrides(self):
+        defaults = {'NUM_COLORS': 15, 'USE_LAB_COLORSPACE': True, 'GMM_BLUR_RADIUS': 1.5,
+                    'CLUSTER_ALGORITHM': 'kmeans', 'OUTPUT_DIR': 'out'}
+        overrides = parse_overrides({'num_colors': ['8'], 'use_lab_colorspace': ['false'],
+                                     'gmm_blur_radius': ['2'], 'cluster_algorithm': ['gmm']}, defaults)
+        self.assertEqual(overrides, {'NUM_COLORS': 8, 'USE_LAB_COLORSPACE': False,
+                                     'GMM_BLUR_RADIUS': 2.0, 'CLUSTER_ALGORITHM': 'gmm'})
+        for query in [{'num_color': ['8']}, {'output_dir': ['/tmp']}, {'use_lab_colorspace': ['maybe']}]:
+            with self.assertRaises(ValueError):
+                parse_overrides(query, defaults)
+
+    def test_parse_overrides_limits(self):
+        """Buffer-sizing settings are capped, untyped settings are rejected"""
+        defaults = {'NUM_COLORS': 15, 'EXPORT_WORKERS': 4, 'TILE_ROWS': 512, 'NUM_COLORS_SWEEP': None,
+                    'GMM_SMOOTH_MODE': 'probability'}
+        self.assertEqual(parse_overrides({'export_workers': ['2'], 'tile_rows': ['64']}, defaults),
+                         {'EXPORT_WORKERS': 2, 'TILE_ROWS': 64})
+        for query in [{'num_colors': ['1000']}, {'num_colors': ['1']}, {'export_workers': ['64']},
+                      {'export_workers': ['0']}, {'tile_rows': ['100000']}, {'num_colors_sweep': ['8,10']}]:
+            with self.assertRaises(ValueError):
+                parse_overrides(query, defaults)
+
+    def test_separate_returns_zip(self):
+        url = self.start()
+        status, headers, body = self.post(url + '/separate?num_colors=2&dot_size=1')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            names = archive.namelist()
+            self.assertEqual(len(names), 2)
+            self.assertTrue(all(name.startswith('layers/') for name in names))
+            with archive.open(names[0]) as f, Image.open(f) as layer:
+                self.assertEqual(layer.size, (12, 12))
+                self.assertAlmostEqual(layer.info['dpi'][0], 300, places=0)
+        stats = self.get_json(url + '/stats')
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['queued'], 0)
+        self.assertIsNotNone(stats['total_seconds']['p50'])
+
+    def test_bad_requests(self):
+        url = self.start()
+        for path, body, code in [
+            ('/separate?output_dir=/tmp', None, 400),
+            ('/separate?num_colors=many', None, 400),
+            ('/separate', b'not an image', 500),
+            ('/missing', None, 404),
+        ]:
+            with self.assertRaises(urllib.error.HTTPError) as caught:
+                self.post(url + path, body)
+            self.assertEqual(caught.exception.code, code)
+        self.assertEqual(self.get_json(url + '/stats')['failed'], 1)
+
+    def test_backpressure(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking_separate(path, output_dir, smooth_dir, settings):
+            started.set()
+            release.wait()
+            os.makedirs(output_dir, exist_ok=True)
+            return []
+
+        service = SeparationService(workers=1, max_queue=1, overrides=self.overrides,
+                                    separate_fn=blocking_separate)
+        service.start()
+        try:
+            first = service.submit('a.png', self.test_dir)
+            started.wait(5)
+            second = service.submit('b.png', self.test_dir)
+            self.assertEqual(service.stats()['queued'], 1)
+            with self.assertRaises(QueueFull):
+                service.submit('c.png', self.test_dir)
+            self.assertEqual(service.stats()['rejected'], 1)
+            release.set()
+            self.assertTrue(first.done.wait(5) and second.done.wait(5))
+            self.assertEqual(service.stats()['completed'], 2)
+        finally:
+            release.set()
+            service.stop()
+
+    def raw_post(self, url, length, body, hang_up=False):
+        """POST `body` while announcing `length` bytes, returns the status code"""
+        host, port = url[len('http://'):].split(':')
+        with socket.create_connection((host, int(port)), timeout=5) as sock:
+            sock.sendall(f"POST /separate HTTP/1.1\r\nHost: {host}\r\n"
+                         f"Content-Length: {length}\r\n\r\n".encode() + body)
+            if hang_up:
+                sock.shutdown(socket.SHUT_WR)
+            with contextlib.redirect_stdout(io.StringIO()):
+                return int(sock.makefile('rb').readline().split()[1])
+
+    def test_admission_before_upload(self):
+        """A full queue answers 503 without reading the body, short uploads free their slot"""
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking_separate(path, output_dir, smooth_dir, settings):
+            started.set()
+            release.wait()
+            os.makedirs(output_dir, exist_ok=True)
+            return []
+
+        url = self.start(workers=1, max_queue=0, separate_fn=blocking_separate)
+        service = self.servers[-1][1]
+        first = threading.Thread(target=self.post, args=(url + '/separate',))
+        first.start()
+        try:
+            self.assertTrue(started.wait(5))
+            # Only 10 of the announced bytes arrive: reading the body would hang
+            self.assertEqual(self.raw_post(url, 1 << 19, b'x' * 10), 503)
+        finally:
+            release.set()
+            first.join(5)
+        self.assertEqual(self.raw_post(url, 1 << 19, b'x' * 10, hang_up=True), 400)
+        stats = service.stats()
+        self.assertEqual((stats['rejected'], stats['queued'], stats['running']), (1, 0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import contextlib
+import io
+import numpy as np
+from PIL import Image, ImageFilter
+from utils.layer_exporter import build_label_index
+from utils.smoothing import smooth_mask, iter_smooth_layers
+
+class TestSmoothing(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.mask = np.zeros((70, 90), dtype=np.uint8)
+        self.mask[5:12, 60:80] = 255
+        self.mask[40:70, 0:4] = rng.integers(0, 256, (30, 4))
+        self.mask[33, 45] = 200
+
+    def blur(self, mask, radius):
+        return np.asarray(Image.fromarray(mask).filter(ImageFilter.GaussianBlur(radius=radius)))
+
+    def test_smooth_mask_matches_full_blur(self):
+        for radius in [0.5, 1.5, 4]:
+            for tile in [8, 16, 256]:
+                np.testing.assert_array_equal(smooth_mask(self.mask, radius, tile), self.blur(self.mask, radius))
+
+    def test_smooth_mask_empty_and_full(self):
+        empty = np.zeros((20, 30), dtype=np.uint8)
+        self.assertFalse(smooth_mask(empty, 1.5, tile=8).any())
+        full = np.random.default_rng(1).integers(0, 256, (20, 30)).astype(np.uint8)
+        np.testing.assert_array_equal(smooth_mask(full, 1.5, tile=8), self.blur(full, 1.5))
+
+    def test_antialias_keeps_coverage(self):
+        labels = np.zeros((40, 50), dtype=np.uint8)
+        labels[10:30, 5:25] = 1
+        labels[:, 35:] = 2
+        order, offsets = build_label_index(labels, 3)
+        stack = np.zeros((3, 40, 50), dtype=np.uint8)
+        total = np.zeros(labels.shape, dtype=np.int64)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i, soft, hard in iter_smooth_layers(order, offsets, labels.shape, stack, 2, mode="antialias", tile=8):
+                np.testing.assert_array_equal(hard, np.where(labels == i, 255, 0))
+                np.testing.assert_array_equal(soft, self.blur(hard.copy(), 2))
+                total += soft
+        self.assertLessEqual(np.abs(total - 255).max(), 3)
+
+    def test_unknown_mode(self):
+        labels = np.zeros((4, 4), dtype=np.uint8)
+        order, offsets = build_label_index(labels, 1)
+        with self.assertRaises(ValueError):
+            list(iter_smooth_layers(order, offsets, labels.shape, np.zeros((1, 4, 4), np.uint8), 1, mode="sharp"))
+
+if __name__ == '__main__':
+    unittest.main()
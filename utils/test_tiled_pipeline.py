@@ -0,0 +1,68 @@
+import unittest
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import numpy as np
+from PIL import Image
+from utils.tiled_pipeline import separate_tiled
+
+class TestTiledPipeline(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.test_dir, 'input.png')
+        arr = np.zeros((30, 20, 3), dtype=np.uint8)
+        arr[:10] = [255, 0, 0]
+        arr[10:20] = [0, 255, 0]
+        arr[20:] = [0, 0, 255]
+        Image.fromarray(arr).save(self.image_path, dpi=(300, 300))
+        self.out_dir = os.path.join(self.test_dir, 'layers')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def run_quiet(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return separate_tiled(self.image_path, 3, self.out_dir, tile_rows=7, sample_size=300, **kwargs)
+
+    def test_kmeans_layers_cover_image(self):
+        centers = self.run_quiet(use_lab_space=True)
+        self.assertEqual(centers.shape, (3, 3))
+        alpha = np.zeros((30, 20), dtype=int)
+        for name in os.listdir(self.out_dir):
+            with Image.open(os.path.join(self.out_dir, name)) as img:
+                self.assertEqual(img.size, (20, 30))
+                alpha += np.array(img)[..., 3] // 255
+        np.testing.assert_array_equal(alpha, 1)
+
+    def test_seeded_fit_is_reproducible(self):
+        """Green seeding and every sampler give the same palette on a rerun"""
+        noise = np.random.default_rng(0).integers(0, 256, (30, 20, 3), dtype=np.uint8)
+        Image.fromarray(noise).save(self.image_path)
+        for strategy in ['uniform', 'tile', 'histogram']:
+            first = self.run_quiet(ensure_green=True, sample_strategy=strategy, seed=3)
+            second = self.run_quiet(ensure_green=True, sample_strategy=strategy, seed=3)
+            np.testing.assert_array_equal(first, second)
+        first = self.run_quiet(algorithm='minibatch', minibatch_size=64, ensure_green=True, seed=3)
+        second = self.run_quiet(algorithm='minibatch', minibatch_size=64, ensure_green=True, seed=3)
+        np.testing.assert_array_equal(first, second)
+
+    def test_minibatch_layers(self):
+        centers = self.run_quiet(algorithm='minibatch', minibatch_size=64)
+        self.assertEqual(centers.shape, (3, 3))
+        self.assertEqual(len(os.listdir(self.out_dir)), 3)
+
+    def test_gmm_smooth_layers(self):
+        smooth_dir = os.path.join(self.test_dir, 'smooth')
+        self.run_quiet(algorithm='gmm', export_smooth=True, smooth_dir=smooth_dir)
+        files = os.listdir(smooth_dir)
+        self.assertEqual(len([f for f in files if f.endswith('_soft.png')]), 3)
+        self.assertEqual(len([f for f in files if f.endswith('_hard.png')]), 3)
+
+    def test_unsupported_algorithm(self):
+        with self.assertRaises(ValueError):
+            self.run_quiet(algorithm='dbscan')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import numpy as np
+
+from utils.image_loader import read_image_info, iter_row_bands, sample_image_pixels
+from utils.kmeans_cpu import kmeans_fit, kmeans_minibatch_fit, kmeans_predict, kmeans_centers
+from utils.assign import LabelCache
+from utils.sampling import uniform_indices
+from utils.gmm_cpu import gmm_fit, gmm_predict_labels, gmm_predict_chunked, gmm_centers
+from utils.layer_exporter import blur_halo, export_layers_tiled, export_smooth_layers_tiled
+
+
+def separate_tiled(path, k, out_dir, algorithm="kmeans", tile_rows=512, sample_size=200_000,
+                   dot_size=1, ensure_green=False, use_lab_space=False,
+                   covariance_type='full', export_smooth=False, smooth_dir=None, blur_radius=1.5,
+                   minibatch_size=4096, smooth_mode="probability", sample_strategy="uniform", seed=42):
+    """Fit on a pixel sample, then label and export the image band by band.
+
+    Peak memory is bounded by `tile_rows` full-width rows (plus the decoder's
+    own 8-bit copy of the image) instead of the float64 (H*W, K) buffers
+    used by kmeans_cpu/gmm_cpu. algorithm "minibatch" fits with partial_fit
+    on a batch from every band instead of a single up-front sample. The
+    fit sample is drawn by the seeded `sample_strategy` sampler of
+    utils.sampling, so runs are reproducible.
+    """
+    info = read_image_info(path)
+    w, h = info['size']
+    print(f"🕜 Please wait... image separation proccessing to {k} layers ({tile_rows} px tiles)...")
+
+    if algorithm in ("kmeans", "minibatch"):
+        if algorithm == "kmeans":
+            sample = sample_image_pixels(path, sample_size, tile_rows, seed, sample_strategy)
+            model = kmeans_fit(sample, k, ensure_green=ensure_green, use_lab_space=use_lab_space, seed=seed)
+        else:
+            model = kmeans_minibatch_fit(
+                _band_batches(path, tile_rows, minibatch_size, seed), k,
+                ensure_green=ensure_green, use_lab_space=use_lab_space, batch_size=minibatch_size, seed=seed
+            )
+        centers = kmeans_centers(model, use_lab_space)
+        assign = LabelCache(lambda colors: kmeans_predict(model, colors, use_lab_space), k)
+        bands = (
+            (y0, assign(band.reshape((-1, 3))).reshape((y1 - y0, w)))
+            for y0, y1, band, _ in iter_row_bands(path, tile_rows)
+        )
+        export_layers_tiled(bands, centers, out_dir, (h, w), info, dot_size)
+    elif algorithm == "gmm":
+        sample = sample_image_pixels(path, sample_size, tile_rows, seed, sample_strategy)
+        gmm, scaler = gmm_fit(sample, k, covariance_type)
+        centers = gmm_centers(gmm, scaler)
+        if export_smooth:
+            export_smooth_layers_tiled(
+                _gmm_smooth_bands(path, gmm, scaler, w, tile_rows, blur_halo(blur_radius)),
+                centers, smooth_dir, (h, w), blur_radius, smooth_mode
+            )
+        else:
+            assign = LabelCache(lambda colors: gmm_predict_labels(gmm, scaler, colors), k)
+            bands = (
+                (y0, assign(band.reshape((-1, 3))).reshape((y1 - y0, w)))
+                for y0, y1, band, _ in iter_row_bands(path, tile_rows)
+            )
+            export_layers_tiled(bands, centers, out_dir, (h, w), info, dot_size)
+    else:
+        raise ValueError("Unsupported clustering algorithm: " + algorithm)
+
+    return centers
+
+
+def _gmm_smooth_bands(path, gmm, scaler, w, tile_rows, halo):
+    for y0, y1, band, pad_top in iter_row_bands(path, tile_rows, halo):
+        labels, soft = gmm_predict_chunked(gmm, scaler, band.reshape((-1, 3)))
+        yield labels.reshape((-1, w)), soft.reshape((len(soft), -1, w)), pad_top, y1 - y0
+
+
+def _band_batches(path, tile_rows, batch_size, seed=42):
+    # Seed the centers from the whole image, not from the first band
+    yield sample_image_pixels(path, 3 * batch_size, tile_rows, seed)
+    rng = np.random.default_rng(seed)
+    for _, _, band, _ in iter_row_bands(path, tile_rows):
+        flat = band.reshape((-1, 3))
+        yield flat[uniform_indices(len(flat), min(batch_size, len(flat)), rng)]